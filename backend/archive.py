@@ -0,0 +1,95 @@
+import datetime
+import json
+import os
+import zlib
+from sqlalchemy import select, delete, exists, or_, and_
+from sqlalchemy.orm import Session
+import database, models, request_states, serializers, versions
+
+# Cold archival of chat history. Messages of requests closed for ARCHIVE_AFTER_DAYS
+# are compacted into one compressed blob per request in message_archives and
+# removed from the hot messages table. Readers go through chat_history(), which
+# stitches archived and hot messages back together.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "100"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+def _encode(messages: list) -> bytes:
+    return zlib.compress(json.dumps(messages, separators=(",", ":")).encode())
+
+def _decode(payload: bytes) -> list:
+    return json.loads(zlib.decompress(payload)) if payload else []
+
+def _message_dict(row) -> dict:
+    data = row._asdict()
+    data["timestamp"] = data["timestamp"].isoformat() if data["timestamp"] else None
+    return data
+
+def chat_history(db: Session, request_id: int) -> list:
+    """All messages of a request, archived ones first, as MessageOut-shaped dicts."""
+    archived = db.query(models.MessageArchive.payload).filter(models.MessageArchive.request_id == request_id).scalar()
+    hot = db.query(*serializers.MESSAGE_COLUMNS).filter(models.Message.request_id == request_id).order_by(models.Message.id).all()
+    return _decode(archived) + serializers.row_dicts(hot)
+
+def _archive_request(db: Session, request_id: int) -> int:
+    rows = db.query(*serializers.MESSAGE_COLUMNS).filter(models.Message.request_id == request_id).order_by(models.Message.id).all()
+    if not rows:
+        return 0
+
+    archive = db.query(models.MessageArchive).filter(models.MessageArchive.request_id == request_id).first()
+    if archive is None:
+        archive = models.MessageArchive(request_id=request_id)
+        db.add(archive)
+    # Late messages on an already archived request are merged into the existing blob
+    messages = _decode(archive.payload) + [_message_dict(r) for r in rows]
+    archive.payload = _encode(messages)
+    archive.message_count = len(messages)
+    archive.archived_at = datetime.datetime.utcnow()
+
+    db.execute(
+        delete(models.Message)
+        .where(models.Message.request_id == request_id, models.Message.id <= rows[-1].id)
+        .execution_options(synchronize_session=False)
+    )
+    return len(rows)
+
+def archive_closed_chats(days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Archive chats of requests closed more than `days` ago, batch_size requests per
+    transaction. Candidate requests are locked with FOR UPDATE SKIP LOCKED so
+    concurrent workers take disjoint batches. Returns the number of messages moved.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    closed_before_cutoff = or_(
+        models.HelpRequest.closed_at < cutoff,
+        # Requests closed before closed_at existed
+        and_(models.HelpRequest.closed_at == None, models.HelpRequest.created_at < cutoff)
+    )
+    has_hot_messages = exists().where(models.Message.request_id == models.HelpRequest.id)
+
+    moved = 0
+    while True:
+        db = database.SessionLocal()
+        try:
+            requests = db.execute(
+                select(models.HelpRequest.id, models.HelpRequest.student_id, models.HelpRequest.helper_id)
+                .where(models.HelpRequest.status.in_(request_states.CLOSED), closed_before_cutoff, has_hot_messages)
+                .limit(batch_size)
+                .with_for_update(of=models.HelpRequest, skip_locked=True)
+            ).all()
+
+            batch_moved = sum(_archive_request(db, r.id) for r in requests)
+            # Unread counts only cover hot messages, so they change for both participants
+            versions.touch_users(db, *[user_id for r in requests for user_id in (r.student_id, r.helper_id)])
+            db.commit()
+        finally:
+            db.close()
+
+        moved += batch_moved
+        if len(requests) < batch_size:
+            return moved
+
+if __name__ == "__main__":
+    import sys
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS
+    print(f"Archived {archive_closed_chats(days)} messages from requests closed over {days} days ago.")
@@ -0,0 +1,104 @@
+import asyncio
+import collections
+import datetime
+import os
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+import database, models
+
+# Buffered audit writer: log entries are queued in memory and batch-inserted by a
+# background task, so admin operations never pay for an extra commit.
+FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+FLUSH_BATCH_SIZE = int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "500"))
+# Upper bound on buffered entries while the database is unreachable; the oldest are dropped
+MAX_BUFFER = int(os.getenv("AUDIT_MAX_BUFFER", "10000"))
+
+class AuditWriter:
+    def __init__(self, interval: float = FLUSH_INTERVAL_SECONDS, batch_size: int = FLUSH_BATCH_SIZE, max_buffer: int = MAX_BUFFER):
+        self.interval = interval
+        self.batch_size = batch_size
+        # deque.append / popleft are atomic, so sync endpoints running in the
+        # threadpool can enqueue without taking a lock. A full deque evicts its oldest entry.
+        self._buffer = collections.deque(maxlen=max_buffer)
+        self._overflowed = 0
+        self._task = None
+
+    def log(self, user_id: int, action: str, details: str = None):
+        if len(self._buffer) == self._buffer.maxlen:
+            self._overflowed += 1
+        self._buffer.append({
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "timestamp": datetime.datetime.utcnow(),
+        })
+
+    def _drain(self):
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _insert(self, rows: list):
+        db = database.SessionLocal()
+        try:
+            db.execute(insert(models.ActivityLog), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _insert_one_by_one(self, batch: list) -> bool:
+        """
+        Fallback after a failed batch: a row the database rejects is logged and
+        dropped so it cannot block the queue. Returns False if the database is
+        unreachable; the unwritten rows are then put back for the next tick.
+        """
+        for index, row in enumerate(batch):
+            try:
+                self._insert([row])
+            except OperationalError as e:
+                print(f"Audit log database unavailable, will retry: {e}")
+                self._buffer.extendleft(reversed(batch[index:]))
+                return False
+            except Exception as e:
+                print(f"Dropping audit log entry {row}: {e}")
+        return True
+
+    def flush(self):
+        """Write everything currently buffered. Safe to call from scripts."""
+        if self._overflowed:
+            print(f"Audit log buffer full, dropped {self._overflowed} oldest entries")
+            self._overflowed = 0
+        while self._buffer:
+            batch = self._drain()
+            try:
+                self._insert(batch)
+            except Exception as e:
+                print(f"Error flushing audit log ({len(batch)} entries), retrying row by row: {e}")
+                if not self._insert_one_by_one(batch):
+                    return
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._buffer:
+                await asyncio.to_thread(self.flush)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+writer = AuditWriter()
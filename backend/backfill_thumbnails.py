@@ -0,0 +1,84 @@
+import concurrent.futures
+import json
+import os
+from sqlalchemy import select, update
+import database, models, thumbnails
+
+# Backfill command: render thumbnails for attachments uploaded before the
+# thumbnail pipeline existed, and for uploads whose background render was dropped
+# (queue full) or failed. create_request stores thumbnail URLs up front, so a row
+# is judged by whether its thumbnail files exist on disk, not by the column.
+# URLs of renders that fail again are cleared. Safe to re-run; cached thumbnails
+# are not re-rendered. Run with: python backfill_thumbnails.py
+
+BATCH_SIZE = 200
+
+def _thumbnails_for(attachments: list, executor) -> list:
+    urls = [None] * len(attachments)
+    futures = {}
+    for index, path in enumerate(attachments):
+        file_path = os.path.join("uploads", os.path.basename(path))
+        if not thumbnails.is_previewable(file_path) or not os.path.exists(file_path):
+            continue
+        digest = thumbnails.file_hash(file_path)
+        futures[index] = (digest, executor.submit(thumbnails.render, file_path, digest))
+    # Only record thumbnails that actually rendered; unreadable files keep the plain link
+    for index, (digest, future) in futures.items():
+        if future.result():
+            urls[index] = thumbnails.thumbnail_url(digest)
+    return urls
+
+def _is_complete(attachments: list, stored) -> bool:
+    if not stored or len(stored) != len(attachments):
+        return False
+    for path, url in zip(attachments, stored):
+        if url is None:
+            # Nothing to show for this type; previewable files are retried
+            if thumbnails.is_previewable(path):
+                return False
+        elif not os.path.exists(os.path.join(thumbnails.THUMB_DIR, os.path.basename(url))):
+            return False
+    return True
+
+def backfill_thumbnails():
+    db = database.SessionLocal()
+    updated = 0
+    last_id = 0
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=thumbnails.MAX_WORKERS, mp_context=thumbnails.MP_CONTEXT) as executor:
+            while True:
+                rows = db.execute(
+                    select(models.HelpRequest.id, models.HelpRequest.attachments, models.HelpRequest.thumbnails)
+                    .where(models.HelpRequest.attachments != None, models.HelpRequest.id > last_id)
+                    .order_by(models.HelpRequest.id)
+                    .limit(BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+
+                for row in rows:
+                    try:
+                        attachments = json.loads(row.attachments)
+                        stored = json.loads(row.thumbnails) if row.thumbnails else None
+                    except ValueError:
+                        continue
+                    if _is_complete(attachments, stored):
+                        continue
+                    urls = _thumbnails_for(attachments, executor)
+                    new_value = json.dumps(urls) if any(urls) else None
+                    if new_value != row.thumbnails:
+                        db.execute(
+                            update(models.HelpRequest)
+                            .where(models.HelpRequest.id == row.id)
+                            .values(thumbnails=new_value)
+                            .execution_options(synchronize_session=False)
+                        )
+                        updated += 1
+                db.commit()
+                last_id = rows[-1].id
+        print(f"Updated thumbnails of {updated} requests.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_thumbnails()
@@ -0,0 +1,83 @@
+import threading
+import time
+import uuid
+import database, models, request_states
+
+# Contention benchmark for request acceptance: many helpers race to accept the
+# same open request, each in its own session/transaction. Exactly one must win.
+# Run with: python bench_accept_contention.py [helpers] [rounds]
+
+def setup(num_helpers: int):
+    db = database.SessionLocal()
+    tag = uuid.uuid4().hex[:8]
+    student = models.User(name="Bench Student", email=f"bench_student_{tag}@bench.local", hashed_password="x", role="student")
+    helpers = [
+        models.User(name=f"Bench Helper {i}", email=f"bench_helper_{tag}_{i}@bench.local", hashed_password="x", role="helper")
+        for i in range(num_helpers)
+    ]
+    db.add(student)
+    db.add_all(helpers)
+    db.commit()
+    ids = (student.id, [h.id for h in helpers])
+    db.close()
+    return ids
+
+def run_round(student_id: int, helper_ids: list):
+    db = database.SessionLocal()
+    req = models.HelpRequest(title="Bench", subject="Bench", description="Contention benchmark", student_id=student_id)
+    db.add(req)
+    db.commit()
+    request_id = req.id
+    db.close()
+
+    barrier = threading.Barrier(len(helper_ids))
+    winners, errors = [], []
+
+    def attempt(helper_id):
+        session = database.SessionLocal()
+        try:
+            barrier.wait()
+            row = request_states.transition(
+                session, request_id, "accept",
+                models.HelpRequest.helper_id == None,
+                helper_id=helper_id
+            )
+            session.commit()
+            if row:
+                winners.append(helper_id)
+        except Exception as e:
+            session.rollback()
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=attempt, args=(h,)) for h in helper_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    db = database.SessionLocal()
+    final = db.query(models.HelpRequest).filter(models.HelpRequest.id == request_id).first()
+    ok = len(winners) == 1 and final.status == request_states.IN_PROGRESS and final.helper_id == winners[0]
+    db.close()
+    return ok, len(winners), len(errors), elapsed
+
+if __name__ == "__main__":
+    import sys
+    num_helpers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    student_id, helper_ids = setup(num_helpers)
+    failures = 0
+    total = 0.0
+    for i in range(rounds):
+        ok, num_winners, num_errors, elapsed = run_round(student_id, helper_ids)
+        total += elapsed
+        if not ok:
+            failures += 1
+        print(f"round {i + 1}: winners={num_winners} errors={num_errors} {elapsed * 1000:.1f} ms {'OK' if ok else 'FAIL'}")
+
+    print(f"{rounds} rounds x {num_helpers} helpers: {failures} failures, avg {total / rounds * 1000:.1f} ms per round")
@@ -0,0 +1,70 @@
+import datetime
+import json
+import time
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import models, schemas, serializers
+
+# Serialization benchmark for the request list endpoints, on an in-memory SQLite
+# database so it never touches the configured one. Compares the old path (load
+# ORM objects, validate each through HelpRequestOut, dump) against the fast path
+# (column projection -> dicts -> orjson).
+# Run with: python bench_serialization.py [rows] [repeats]
+
+def seed(session, num_rows: int):
+    student = models.User(name="Bench Student", email="bench@bench.local", hashed_password="x", role="student")
+    session.add(student)
+    session.flush()
+    now = datetime.datetime.utcnow()
+    session.add_all([
+        models.HelpRequest(
+            title=f"Request {i}", subject="Mathematics", description="Need help with integration by parts " * 4,
+            deadline=now, budget=500.0, status="open", student_id=student.id, created_at=now,
+            attachments=json.dumps([f"/uploads/file-{i}.pdf"])
+        )
+        for i in range(num_rows)
+    ])
+    session.commit()
+
+def old_path(session) -> bytes:
+    reqs = session.query(models.HelpRequest).all()
+    for r in reqs:
+        if r.attachments:
+            r.attachments = json.loads(r.attachments)
+    adapter = TypeAdapter(List[schemas.HelpRequestOut])
+    body = adapter.dump_json(adapter.validate_python(reqs, from_attributes=True))
+    session.rollback()  # discard the attachment mutations, as the request session would
+    return body
+
+def fast_path(session) -> bytes:
+    rows = session.query(*serializers.REQUEST_COLUMNS).all()
+    return serializers.FastJSONResponse([serializers.request_dict(r) for r in rows]).body
+
+def measure(fn, session, repeats: int) -> float:
+    fn(session)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(session)
+    return (time.perf_counter() - start) / repeats
+
+if __name__ == "__main__":
+    import sys
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, num_rows)
+
+    assert json.loads(old_path(session)) == json.loads(fast_path(session)), "paths disagree"
+
+    old = measure(old_path, session, repeats)
+    fast = measure(fast_path, session, repeats)
+    per_1000 = 1000 / num_rows
+    print(f"{num_rows} rows, {repeats} repeats")
+    print(f"ORM + Pydantic: {old * per_1000 * 1000:.2f} ms per 1,000 rows")
+    print(f"columns + orjson: {fast * per_1000 * 1000:.2f} ms per 1,000 rows")
+    print(f"speedup: {old / fast:.1f}x")
@@ -1,12 +1,23 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, table, column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi import Request
+import itertools
+import time
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional comma-separated read replicas, e.g. postgresql://...@replica1/acadmate,postgresql://...@replica2/acadmate
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write, the same client reads from the primary for this long (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# A replica that failed its health check is skipped for this long
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -19,3 +30,115 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def dialect_insert(db: Session):
+    # INSERT construct with on_conflict_do_update for the session's database
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+# --- Change counters ---
+# Every commit bumps the change_counters row (models.ChangeCounter) of each table it
+# wrote to, plus any per-user keys added with touch(), inside the same transaction,
+# so all workers see the same versions; versions.py turns them into ETags. The hooks
+# sit on SessionLocal itself, so every writer (app, jobs, scripts) keeps them current.
+COUNTER_TABLE = "change_counters"
+# Chat data is versioned per user with touch() instead: a global counter would be
+# bumped by every message, invalidating every user's ETag and serialising commits
+# on one counter row.
+UNVERSIONED_TABLES = {COUNTER_TABLE, "messages", "chat_read_pointers", "message_archives"}
+_CHANGED = "changed_counters"
+_counters = table(COUNTER_TABLE, column("table_name"), column("version"))
+
+def touch(db: Session, *keys: str):
+    """Bump these counter keys when db commits."""
+    db.info.setdefault(_CHANGED, set()).update(keys)
+
+def _track(db: Session, table_name: str):
+    if table_name not in UNVERSIONED_TABLES:
+        touch(db, table_name)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        mapped_table = getattr(obj, "__table__", None)
+        if mapped_table is not None:
+            _track(session, mapped_table.name)
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    # Set-based update()/delete()/insert() statements bypass the flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        _track(orm_execute_state.session, orm_execute_state.statement.table.name)
+
+@event.listens_for(SessionLocal, "before_commit")
+def _bump_on_commit(session):
+    session.flush()
+    keys = session.info.pop(_CHANGED, None)
+    if keys:
+        _bump(session, keys)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _reset_on_rollback(session):
+    session.info.pop(_CHANGED, None)
+
+def _bump(db: Session, keys: set):
+    insert = dialect_insert(db)
+    # Sorted so concurrent commits lock counter rows in the same order
+    stmt = insert(_counters).values([{"table_name": key, "version": 1} for key in sorted(keys)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_counters.c.table_name],
+        set_={"version": _counters.c.version + 1}
+    )
+    db.execute(stmt)
+
+# --- Read replicas ---
+class ReplicaRouter:
+    def __init__(self, urls: list):
+        # pool_pre_ping makes the connection checkout double as a health check
+        self.engines = [create_engine(url, pool_pre_ping=True) for url in urls]
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False)
+        self._down_until = [0.0] * len(self.engines)
+        self._counter = itertools.count()
+
+    def open_session(self, primary: bool = False):
+        """Session on the next healthy replica (round-robin), or on the primary if asked for or none is usable."""
+        if self.engines and not primary:
+            now = time.monotonic()
+            for _ in range(len(self.engines)):
+                index = next(self._counter) % len(self.engines)
+                if self._down_until[index] > now:
+                    continue
+                db = self.sessionmaker(bind=self.engines[index])
+                try:
+                    db.connection()
+                    return db
+                except OperationalError as e:
+                    print(f"Replica {index} unavailable, skipping for {REPLICA_RETRY_SECONDS}s: {e}")
+                    self._down_until[index] = now + REPLICA_RETRY_SECONDS
+                    db.close()
+        return SessionLocal()
+
+replicas = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+# Read-your-writes travels with the client, so it holds across workers: write
+# responses (and Socket.IO message acks) carry the server time of the write in
+# X-Last-Write, and the client echoes the latest value back on its requests.
+LAST_WRITE_HEADER = "X-Last-Write"
+
+def last_write_marker() -> str:
+    return f"{time.time():.3f}"
+
+def recently_wrote(request: Request) -> bool:
+    try:
+        age = time.time() - float(request.headers.get(LAST_WRITE_HEADER))
+    except (TypeError, ValueError):
+        return False
+    # A value in the future is ignored, so a client cannot pin itself to the primary indefinitely
+    return 0 <= age < READ_YOUR_WRITES_SECONDS
+
+def get_read_db(request: Request):
+    """Dependency for read-only endpoints: a replica session unless the client wrote recently."""
+    db = replicas.open_session(primary=recently_wrote(request))
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,21 +1,52 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from typing import List
+from contextlib import asynccontextmanager
 import socketio
 import os
 
 # Important: Core imports before routers to avoid initialization order issues
-import models, schemas, auth, database, utils
+import models, schemas, auth, database, utils, audit, versions, settings_cache, scheduler, archive, unread, thumbnails, profiling
+import asyncio
+
+try:
+    from brotli_asgi import BrotliMiddleware  # optional; negotiates br and falls back to gzip
+except ImportError:
+    BrotliMiddleware = None
 
 # Router imports
-from routers import auth_router, requests_router, messages_router, admin_router, users_router
+from routers import auth_router, requests_router, messages_router, admin_router, users_router, reviews_router, dashboard_router
 
 # Create DB tables
 models.Base.metadata.create_all(bind=database.engine)
 
-app = FastAPI(title="AcadMate API")
+async def expire_requests_job():
+    expired_ids = await asyncio.to_thread(scheduler.expire_overdue_requests)
+    if expired_ids:
+        # Lets open helper feeds drop the cards without refetching
+        await sio.emit('requests_expired', {'request_ids': expired_ids})
+
+async def archive_chats_job():
+    await asyncio.to_thread(archive.archive_closed_chats)
+
+scheduler.scheduler.every(scheduler.EXPIRY_INTERVAL_SECONDS, expire_requests_job)
+scheduler.scheduler.every(archive.ARCHIVE_INTERVAL_SECONDS, archive_chats_job)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    audit.writer.start()
+    settings_cache.cache.start()
+    scheduler.scheduler.start()
+    yield
+    await scheduler.scheduler.stop()
+    await settings_cache.cache.stop()
+    await audit.writer.stop()
+    thumbnails.pool.shutdown()
+
+app = FastAPI(title="AcadMate API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -24,8 +55,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Profile-Id", "X-Last-Write"],
 )
 
+# Read-your-writes: write responses tell the client when it wrote; clients that
+# echo a recent X-Last-Write read from the primary (see database.recently_wrote)
+if database.replicas.engines:
+    @app.middleware("http")
+    async def mark_writes(request, call_next):
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.headers[database.LAST_WRITE_HEADER] = database.last_write_marker()
+        return response
+
+# Compress large JSON list responses
+if BrotliMiddleware:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Opt-in profiling of single requests by admins (outermost, so it sees the whole request)
+app.add_middleware(profiling.ProfilingMiddleware)
+
 # Mount uploads directory
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -34,6 +85,8 @@ app.include_router(auth_router.router, prefix="/api/v1/auth")
 app.include_router(users_router.router, prefix="/api/v1/users")
 app.include_router(requests_router.router, prefix="/api/v1")
 app.include_router(messages_router.router, prefix="/api/v1")
+app.include_router(reviews_router.router, prefix="/api/v1")
+app.include_router(dashboard_router.router, prefix="/api/v1")
 app.include_router(admin_router.admin_router, prefix="/api/v1")
 
 # Socket.io setup
@@ -45,27 +98,77 @@ def read_root():
     return {"message": "Welcome to AcadMate API", "status": "running"}
 
 # Socket Events
+def _participants(request_id) -> tuple:
+    # (student_id, helper_id) of a request, or () if it does not exist
+    db = database.SessionLocal()
+    try:
+        req = db.query(models.HelpRequest.student_id, models.HelpRequest.helper_id).filter(models.HelpRequest.id == request_id).first()
+        return tuple(req) if req else ()
+    finally:
+        db.close()
+
 @sio.event
 async def join_room(sid, data):
+    session = await sio.get_session(sid)
     room = data['request_id']
+    # Only the request's student and helper may follow its chat
+    if session['user_id'] not in await asyncio.to_thread(_participants, room):
+        return {'error': 'Not a participant of this request'}
     await sio.enter_room(sid, str(room))
 
+def _socket_user_id(token: str):
+    db = database.SessionLocal()
+    try:
+        user = auth.user_from_token(db, token)
+        return user.id if user else None
+    finally:
+        db.close()
+
+@sio.event
+async def connect(sid, environ, auth_data):
+    # The user id comes from the access token, never from a client-supplied field
+    token = (auth_data or {}).get("token")
+    user_id = await asyncio.to_thread(_socket_user_id, token) if token else None
+    if user_id is None:
+        raise socketio.exceptions.ConnectionRefusedError("Could not validate credentials")
+    await sio.save_session(sid, {"user_id": user_id})
+    # Personal room for per-user pushes such as unread counts
+    await sio.enter_room(sid, f"user:{user_id}")
+
 @sio.event
 async def send_message(sid, data):
+    session = await sio.get_session(sid)
+    data['sender_id'] = session['user_id']
+    participants = await asyncio.to_thread(_participants, data['request_id'])
+    if data['sender_id'] not in participants:
+        return {'error': 'Not a participant of this request'}
+    student_id, helper_id = participants
+    recipient_id = helper_id if data['sender_id'] == student_id else student_id
     db = database.SessionLocal()
+    unread_count, last_write = 0, None
     try:
         new_msg = models.Message(
             request_id=data['request_id'],
             sender_id=data['sender_id'],
             content=data['content']
         )
+        # The recipient's unread count changes (see versions.user_key)
+        versions.touch_users(db, recipient_id)
         db.add(new_msg)
         db.commit()
+        last_write = database.last_write_marker()
+        
+        if recipient_id:
+            unread_count = unread.unread_counts(db, recipient_id, [data['request_id']]).get(data['request_id'], 0)
     except Exception as e:
         print(f"Error saving message: {e}")
     finally:
         db.close()
     
     await sio.emit('new_message', data, room=str(data['request_id']))
+    if recipient_id:
+        await sio.emit('unread_update', {'request_id': data['request_id'], 'unread_count': unread_count}, room=f"user:{recipient_id}")
+    # Ack for the sender: the X-Last-Write value to echo for read-your-writes
+    return {'last_write': last_write}
 
 # Run with: uvicorn main:socket_app --reload --port 8000
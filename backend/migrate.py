@@ -32,9 +32,13 @@ def migrate():
     add_column_if_not_exists("users", "phone_number", "VARCHAR")
     add_column_if_not_exists("users", "is_suspended", "BOOLEAN DEFAULT FALSE")
     add_column_if_not_exists("users", "is_verified", "BOOLEAN DEFAULT FALSE")
+    add_column_if_not_exists("users", "rating_sum", "FLOAT DEFAULT 0")
+    add_column_if_not_exists("users", "rating_count", "INTEGER DEFAULT 0")
 
     # Help requests table updates
     add_column_if_not_exists("help_requests", "advance_paid", "BOOLEAN DEFAULT FALSE")
+    add_column_if_not_exists("help_requests", "closed_at", "TIMESTAMP")
+    add_column_if_not_exists("help_requests", "thumbnails", "TEXT")
 
     # Create new tables
     with engine.connect() as conn:
@@ -61,6 +65,20 @@ def migrate():
                 );
             """))
             
+            # Audit log indexes for filtered / paginated log queries
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_logs_timestamp ON activity_logs (timestamp);"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_logs_user_id_timestamp ON activity_logs (user_id, timestamp);"))
+            
+            # Ratings: sortable helper rating, one review per request
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_rating ON users (rating);"))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_reviews_request_id ON reviews (request_id);"))
+            
+            # Expiry scheduler scans open requests by deadline
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_help_requests_status_deadline ON help_requests (status, deadline);"))
+            
+            # Chat history lookups by request
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_request_id_id ON messages (request_id, id);"))
+            
             # Default settings
             res = conn.execute(text("SELECT COUNT(*) FROM system_settings"))
             if res.scalar() == 0:
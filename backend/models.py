@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Boolean, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -14,6 +14,7 @@ class RequestStatus(str, enum.Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     CANCELLED = "cancelled"
+    EXPIRED = "expired"
 
 class User(Base):
     __tablename__ = "users"
@@ -24,7 +25,10 @@ class User(Base):
     hashed_password = Column(String)
     role = Column(String) # student, helper, admin
     phone_number = Column(String, nullable=True)
-    rating = Column(Float, default=0.0)
+    rating = Column(Float, default=0.0, index=True)
+    # Running aggregate of received reviews; rating = rating_sum / rating_count
+    rating_sum = Column(Float, default=0.0)
+    rating_count = Column(Integer, default=0)
     completed_tasks = Column(Integer, default=0)
     is_suspended = Column(Boolean, default=False)
     is_verified = Column(Boolean, default=False)
@@ -42,20 +46,27 @@ class HelpRequest(Base):
     description = Column(Text)
     deadline = Column(DateTime)
     budget = Column(Float, nullable=True)
-    status = Column(String, default="open") # open, in_progress, completed, cancelled
+    status = Column(String, default="open") # open, in_progress, completed, cancelled, expired
     advance_paid = Column(Boolean, default=False)
     attachments = Column(Text, nullable=True) # JSON list of file paths
+    thumbnails = Column(Text, nullable=True) # JSON list of thumbnail URLs, parallel to attachments (null if none)
     
     student_id = Column(Integer, ForeignKey("users.id"))
     helper_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    closed_at = Column(DateTime, nullable=True) # set when completed, cancelled or expired
 
     student = relationship("User", foreign_keys=[student_id], back_populates="requests_as_student")
     helper = relationship("User", foreign_keys=[helper_id], back_populates="requests_as_helper")
     messages = relationship("Message", back_populates="request")
     reviews = relationship("Review", back_populates="request")
 
+    __table_args__ = (
+        # Serves the expiry scheduler's "open and past deadline" scan
+        Index("ix_help_requests_status_deadline", "status", "deadline"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -67,11 +78,34 @@ class Message(Base):
 
     request = relationship("HelpRequest", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_request_id_id", "request_id", "id"),
+        # Message ids must never be reused once archived rows are deleted
+        {"sqlite_autoincrement": True},
+    )
+
+class ChatReadPointer(Base):
+    __tablename__ = "chat_read_pointers"
+
+    # Highest message id the user has seen in a request's chat
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    request_id = Column(Integer, ForeignKey("help_requests.id"), primary_key=True)
+    last_read_message_id = Column(Integer, default=0, nullable=False)
+
+class MessageArchive(Base):
+    __tablename__ = "message_archives"
+
+    # Cold chat history of a closed request: zlib-compressed JSON list of messages
+    request_id = Column(Integer, ForeignKey("help_requests.id"), primary_key=True)
+    payload = Column(LargeBinary)
+    message_count = Column(Integer, default=0)
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class Review(Base):
     __tablename__ = "reviews"
 
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("help_requests.id"))
+    request_id = Column(Integer, ForeignKey("help_requests.id"), unique=True, index=True)
     rating = Column(Integer)
     feedback = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -87,6 +121,11 @@ class ActivityLog(Base):
     details = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_activity_logs_timestamp", "timestamp"),
+        Index("ix_activity_logs_user_id_timestamp", "user_id", "timestamp"),
+    )
+
 class SystemSettings(Base):
     __tablename__ = "system_settings"
 
@@ -96,3 +135,10 @@ class SystemSettings(Base):
     commission_percentage = Column(Float, default=10.0)
     payment_system_enabled = Column(Boolean, default=True)
     platform_notice = Column(String, nullable=True)
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+
+    # One row per table, bumped on every commit that writes to it (see database.py)
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,240 @@
+import asyncio
+import collections
+import contextvars
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+from jose import JWTError, jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import auth
+
+# On-demand request profiling. An admin sends "X-Profile: 1" (or ?profile=1) and
+# that one request runs under a stack sampler with its SQL statements timed. The
+# result is written to PROFILE_DIR, so any worker can serve it, and its id is
+# returned in the X-Profile-Id header. Stacks are stored in the folded format
+# ("frame;frame;frame count") read by flamegraph.pl and speedscope.
+#
+# Requests without the flag only pay for one header lookup; the SQL listeners are
+# attached only while a profile is running.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.005"))
+
+_current = contextvars.ContextVar("current_profile", default=None)
+
+class Profile:
+    def __init__(self, method: str, path: str, user: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.user = user
+        self.started_at = datetime.datetime.utcnow()
+        self.status_code = None
+        self.duration_ms = None
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self.queries = []
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "user": self.user,
+            "started_at": self.started_at.isoformat(),
+            "status_code": self.status_code,
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+            "query_count": len(self.queries),
+            "query_ms": round(sum(q["duration_ms"] for q in self.queries), 3),
+        }
+
+# --- SQL timing ---
+_listeners = 0
+_listeners_lock = threading.Lock()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is None or not conn.info.get("profile_start"):
+        return
+    elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+    profile.queries.append({
+        "statement": statement,
+        "parameters": repr(parameters)[:500],
+        "duration_ms": round(elapsed * 1000, 3),
+        "rowcount": cursor.rowcount,
+    })
+
+def _attach_listeners():
+    global _listeners
+    with _listeners_lock:
+        if _listeners == 0:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listeners += 1
+
+def _detach_listeners():
+    global _listeners
+    with _listeners_lock:
+        _listeners -= 1
+        if _listeners == 0:
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+# --- Stack sampling ---
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class Sampler(threading.Thread):
+    """
+    Samples the stacks of the threads running the request's endpoint. Sync
+    endpoints run on a threadpool thread and async ones on the event loop, so a
+    thread is attributed to the request while the endpoint's code is on its stack.
+    Concurrent calls to the same endpoint in this worker are sampled as well.
+    """
+    def __init__(self, profile: Profile, scope: dict):
+        super().__init__(name=f"profiler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.scope = scope
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(SAMPLE_INTERVAL_SECONDS):
+            # Starlette sets the endpoint on the scope once the route is matched
+            endpoint = self.scope.get("endpoint")
+            target = getattr(endpoint, "__code__", None)
+            if target is None:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                if target not in codes:
+                    continue
+                # Root the stack at the endpoint; the server machinery below it is noise
+                codes = codes[:codes.index(target) + 1]
+                self.profile.stacks[";".join(_frame_label(c) for c in reversed(codes))] += 1
+                self.profile.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# --- Storage ---
+def _path(profile_id: str, ext: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{ext}")
+
+def save(profile: Profile):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(_path(profile.id, "folded"), "w") as f:
+        for stack, count in profile.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(_path(profile.id, "json"), "w") as f:
+        json.dump({**profile.summary(), "queries": profile.queries}, f)
+
+    # Keep only the newest PROFILE_KEEP profiles
+    saved = sorted(
+        (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".json")),
+        key=os.path.getmtime
+    )
+    for old in saved[:-PROFILE_KEEP]:
+        for ext in ("json", "folded"):
+            try:
+                os.remove(old[:-len("json")] + ext)
+            except FileNotFoundError:
+                pass
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            data.pop("queries", None)
+            profiles.append(data)
+    return sorted(profiles, key=lambda p: p["started_at"], reverse=True)
+
+def load(profile_id: str, ext: str = "json"):
+    """Stored profile by id, or None. Ids are hex, so they cannot escape PROFILE_DIR."""
+    if not profile_id.isalnum():
+        return None
+    try:
+        with open(_path(profile_id, ext)) as f:
+            return json.load(f) if ext == "json" else f.read()
+    except FileNotFoundError:
+        return None
+
+# --- Middleware ---
+def _requested(scope: dict) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value in (b"1", b"true")
+    query = scope.get("query_string")
+    return bool(query) and b"profile=" in query and parse_qs(query.decode()).get("profile", [""])[0] in ("1", "true")
+
+def _admin_email(scope: dict):
+    # Decided from the token's role claim alone, so the check costs no query;
+    # reading profiles back still goes through the full admin dependency.
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            token = value.decode().partition(" ")[2]
+            try:
+                payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            except JWTError:
+                return None
+            if payload.get("type") == "access" and payload.get("role") == "admin":
+                return payload.get("sub")
+    return None
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+        user = _admin_email(scope)
+        if user is None:
+            return await self.app(scope, receive, send)
+
+        profile = Profile(scope["method"], scope["path"], user)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _current.set(profile)
+        sampler = Sampler(profile, scope)
+        _attach_listeners()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            sampler.stop()
+            _detach_listeners()
+            _current.reset(token)
+            # File writes plus pruning; keep them off the event loop
+            await asyncio.to_thread(save, profile)
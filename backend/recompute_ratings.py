@@ -0,0 +1,36 @@
+from sqlalchemy import update, select, func
+import database, models
+
+# Repair command: rebuild every user's rating aggregate from the reviews table
+# in a single set-based UPDATE. Run with: python recompute_ratings.py
+
+def recompute_ratings():
+    db = database.SessionLocal()
+    try:
+        def helper_reviews(aggregate):
+            return (
+                select(aggregate)
+                .select_from(models.Review)
+                .join(models.HelpRequest, models.HelpRequest.id == models.Review.request_id)
+                .where(models.HelpRequest.helper_id == models.User.id)
+                .correlate(models.User)
+                .scalar_subquery()
+            )
+        rating_sum = helper_reviews(func.coalesce(func.sum(models.Review.rating), 0))
+        rating_count = helper_reviews(func.count(models.Review.id))
+        result = db.execute(
+            update(models.User)
+            .values(
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                rating=func.coalesce(rating_sum * 1.0 / func.nullif(rating_count, 0), 0.0)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        print(f"Recomputed ratings for {result.rowcount} users.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    recompute_ratings()
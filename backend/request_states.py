@@ -0,0 +1,56 @@
+import datetime
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models import HelpRequest, RequestStatus
+
+OPEN = RequestStatus.OPEN.value
+IN_PROGRESS = RequestStatus.IN_PROGRESS.value
+COMPLETED = RequestStatus.COMPLETED.value
+CANCELLED = RequestStatus.CANCELLED.value
+EXPIRED = RequestStatus.EXPIRED.value
+
+CLOSED = {COMPLETED, CANCELLED, EXPIRED}
+
+# Legal transitions: action -> (allowed source statuses, target status)
+TRANSITIONS = {
+    "accept": ({OPEN}, IN_PROGRESS),
+    "complete": ({IN_PROGRESS}, COMPLETED),
+    "cancel": ({OPEN, IN_PROGRESS}, CANCELLED),
+    "expire": ({OPEN}, EXPIRED),
+}
+
+def can_transition(action: str, current_status: str) -> bool:
+    # For explaining a failed transition() after re-reading the request
+    sources, _ = TRANSITIONS[action]
+    return current_status in sources
+
+def transition(db: Session, request_id: int, action: str, *conditions, **values):
+    """
+    Apply a transition as a single conditional UPDATE ... RETURNING.
+    The status check and the write happen in one statement, so concurrent callers
+    cannot both win. Returns the updated row (id, student_id, helper_id) or None
+    if the request does not exist or is not in a legal source state / fails the
+    extra conditions. Does not commit.
+    """
+    sources, target = TRANSITIONS[action]
+    if target in CLOSED:
+        values.setdefault("closed_at", datetime.datetime.utcnow())
+    stmt = (
+        update(HelpRequest)
+        .where(HelpRequest.id == request_id, HelpRequest.status.in_(sources), *conditions)
+        .values(status=target, **values)
+        .returning(HelpRequest.id, HelpRequest.student_id, HelpRequest.helper_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).first()
+
+def conditional_update(db: Session, request_id: int, *conditions, **values):
+    """Same single-statement pattern for updates that do not change status (e.g. advance payment)."""
+    stmt = (
+        update(HelpRequest)
+        .where(HelpRequest.id == request_id, *conditions)
+        .values(**values)
+        .returning(HelpRequest.id, HelpRequest.student_id, HelpRequest.helper_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).first()
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-import models, schemas, auth, database, utils
-import datetime
-from sqlalchemy import func
+import models, schemas, auth, database, utils, request_states, versions, serializers, settings_cache, archive, profiling
+import datetime, csv, io, json
+from sqlalchemy import func, tuple_, select, update, delete, or_, case
 
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 
 # --- OVERVIEW ---
 @admin_router.get("/overview", response_model=schemas.AdminOverview)
-def get_overview(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+def get_overview(request: Request, response: Response, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
     auth.check_role(current_user, ["admin"])
+    cached = versions.check_etag(request, response, db, ["users", "help_requests", "system_settings"])
+    if cached:
+        return cached
     
     total_users = db.query(models.User).count()
     total_helpers = db.query(models.User).filter(models.User.role == "helper").count()
@@ -31,19 +35,245 @@ def get_overview(db: Session = Depends(database.get_db), current_user: models.Us
         "active_requests": active_requests,
         "completed_requests": completed_requests,
         "total_transactions": total_transactions,
-        "revenue_summary": revenue_sum * 0.1
+        "revenue_summary": revenue_sum * settings_cache.cache.get().commission_percentage / 100
     }
 
+# --- LISTING HELPERS ---
+USER_SORT_COLUMNS = {
+    "id": models.User.id,
+    "name": models.User.name,
+    "email": models.User.email,
+    "created_at": models.User.created_at,
+    "rating": models.User.rating,
+    "completed_tasks": models.User.completed_tasks,
+}
+REQUEST_SORT_COLUMNS = {
+    "id": models.HelpRequest.id,
+    "created_at": models.HelpRequest.created_at,
+    "deadline": models.HelpRequest.deadline,
+    "budget": models.HelpRequest.budget,
+    "status": models.HelpRequest.status,
+}
+USER_EXPORT_COLUMNS = [
+    models.User.id, models.User.name, models.User.email, models.User.role, models.User.phone_number,
+    models.User.rating, models.User.rating_count, models.User.completed_tasks,
+    models.User.is_suspended, models.User.is_verified, models.User.created_at,
+]
+REQUEST_EXPORT_COLUMNS = [
+    models.HelpRequest.id, models.HelpRequest.title, models.HelpRequest.subject, models.HelpRequest.status,
+    models.HelpRequest.budget, models.HelpRequest.advance_paid, models.HelpRequest.student_id,
+    models.HelpRequest.helper_id, models.HelpRequest.deadline, models.HelpRequest.created_at,
+]
+EXPORT_CHUNK_SIZE = 1000
+
+def _user_filters(role: str = None, verified: bool = None, q: str = None):
+    filters = []
+    if role:
+        filters.append(models.User.role == role)
+    if verified is not None:
+        filters.append(models.User.is_verified == verified)
+    if q:
+        pattern = f"%{q}%"
+        filters.append(or_(models.User.name.ilike(pattern), models.User.email.ilike(pattern)))
+    return filters
+
+def _request_filters(status: str = None, q: str = None):
+    filters = []
+    if status:
+        filters.append(models.HelpRequest.status == status)
+    if q:
+        pattern = f"%{q}%"
+        filters.append(or_(models.HelpRequest.title.ilike(pattern), models.HelpRequest.subject.ilike(pattern)))
+    return filters
+
+def _paginate(query, response: Response, sort_columns: dict, sort: str, order: str, page: int, page_size: int):
+    if sort not in sort_columns:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    # Total goes in a header so the body stays a plain list
+    response.headers["X-Total-Count"] = str(query.order_by(None).count())
+    column = sort_columns[sort]
+    ordering = column.desc() if order == "desc" else column.asc()
+    # Tie-break on id so pages are stable when the sort column has duplicates
+    tie_break = sort_columns["id"].desc() if order == "desc" else sort_columns["id"].asc()
+    return query.order_by(ordering, tie_break).offset((page - 1) * page_size).limit(page_size).all()
+
+# Cells starting with these are run as formulas by spreadsheet apps
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_safe(value):
+    # User-controlled text (names, titles, subjects) is neutralised with a leading quote
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _stream_export(columns: list, filters: list, fmt: str, filename: str):
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    names = [column.key for column in columns]
+    stmt = select(*columns).where(*filters).order_by(columns[0])
+
+    def generate():
+        # Own session: the request-scoped one may be closed before the body is streamed.
+        # yield_per turns on a server-side cursor, so only one chunk is held in memory.
+        db = database.replicas.open_session()
+        try:
+            result = db.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(names)
+                yield buffer.getvalue()
+            for rows in result.partitions():
+                buffer = io.StringIO()
+                if fmt == "csv":
+                    writer = csv.writer(buffer)
+                    writer.writerows([_csv_safe(value) for value in row] for row in rows)
+                else:
+                    for row in rows:
+                        buffer.write(json.dumps(dict(zip(names, row)), default=str))
+                        buffer.write("\n")
+                yield buffer.getvalue()
+        finally:
+            db.close()
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
 # --- USERS ---
 @admin_router.get("/users", response_model=List[schemas.UserOut])
-def list_users(role: str = None, verified: bool = None, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+def list_users(
+    request: Request,
+    response: Response,
+    role: str = None,
+    verified: bool = None,
+    q: str = None,
+    sort: str = "id",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(auth.get_current_admin)
+):
     auth.check_role(current_user, ["admin"])
-    query = db.query(models.User)
-    if role:
-        query = query.filter(models.User.role == role)
-    if verified is not None:
-        query = query.filter(models.User.is_verified == verified)
-    return query.all()
+    cached = versions.check_etag(request, response, db, ["users"], request.url.query)
+    if cached:
+        return cached
+    query = db.query(*serializers.USER_COLUMNS).filter(*_user_filters(role, verified, q))
+    rows = _paginate(query, response, USER_SORT_COLUMNS, sort, order, page, page_size)
+    return serializers.json_response(serializers.row_dicts(rows), response)
+
+@admin_router.get("/users/export")
+def export_users(format: str = "csv", role: str = None, verified: bool = None, q: str = None, current_user: models.User = Depends(auth.get_current_admin)):
+    auth.check_role(current_user, ["admin"])
+    return _stream_export(USER_EXPORT_COLUMNS, _user_filters(role, verified, q), format, "users")
+
+def _bulk_user_filters(selection: schemas.BulkUserSelection, current_user: models.User):
+    filters = []
+    if selection.user_ids is not None:
+        filters.append(models.User.id.in_(selection.user_ids))
+    if selection.role:
+        filters.append(models.User.role == selection.role)
+    if selection.verified is not None:
+        filters.append(models.User.is_verified == selection.verified)
+    if not filters:
+        raise HTTPException(status_code=400, detail="Provide user_ids or at least one filter")
+    # Bulk operations never touch admin accounts (including the caller)
+    filters.append(models.User.role != "admin")
+    filters.append(models.User.id != current_user.id)
+    return filters
+
+def _delete_users(db: Session, filters: list) -> List[int]:
+    """
+    Delete the users matching filters along with their dependent rows, one set-based
+    statement per table. Requests they created are removed with their chats (hot and
+    archived) and reviews; requests they were helping on are released back to the
+    feed. Does not commit.
+    """
+    user_ids = select(models.User.id).where(*filters)
+    owned_requests = select(models.HelpRequest.id).where(models.HelpRequest.student_id.in_(user_ids))
+    
+    db.execute(
+        delete(models.Message)
+        .where(or_(models.Message.request_id.in_(owned_requests), models.Message.sender_id.in_(user_ids)))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(models.ChatReadPointer)
+        .where(or_(models.ChatReadPointer.request_id.in_(owned_requests), models.ChatReadPointer.user_id.in_(user_ids)))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(models.MessageArchive)
+        .where(models.MessageArchive.request_id.in_(owned_requests))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(models.Review)
+        .where(models.Review.request_id.in_(owned_requests))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(models.HelpRequest)
+        .where(models.HelpRequest.helper_id.in_(user_ids))
+        .values(
+            helper_id=None,
+            status=case(
+                (models.HelpRequest.status == request_states.IN_PROGRESS, request_states.OPEN),
+                else_=models.HelpRequest.status
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(models.HelpRequest)
+        .where(models.HelpRequest.student_id.in_(user_ids))
+        .execution_options(synchronize_session=False)
+    )
+    deleted = db.execute(
+        delete(models.User)
+        .where(*filters)
+        .returning(models.User.id)
+        .execution_options(synchronize_session=False)
+    )
+    return [row.id for row in deleted]
+
+@admin_router.put("/users/bulk/status", response_model=schemas.BulkResult)
+def bulk_update_user_status(update_data: schemas.BulkUserStatusUpdate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+    auth.check_role(current_user, ["admin"])
+    values = {}
+    if update_data.is_suspended is not None:
+        values["is_suspended"] = update_data.is_suspended
+    if update_data.is_verified is not None:
+        values["is_verified"] = update_data.is_verified
+    if not values:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    
+    filters = _bulk_user_filters(update_data, current_user)
+    result = db.execute(
+        update(models.User)
+        .where(*filters)
+        .values(**values)
+        .returning(models.User.id)
+        .execution_options(synchronize_session=False)
+    )
+    user_ids = [row.id for row in result]
+    db.commit()
+    
+    utils.log_admin_action(current_user.id, "bulk_update_user_status", f"{values} User IDs: {user_ids}")
+    return {"message": "User status updated", "affected": len(user_ids)}
+
+@admin_router.post("/users/bulk/delete", response_model=schemas.BulkResult)
+def bulk_delete_users(selection: schemas.BulkUserSelection, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+    auth.check_role(current_user, ["admin"])
+    user_ids = _delete_users(db, _bulk_user_filters(selection, current_user))
+    db.commit()
+    
+    utils.log_admin_action(current_user.id, "bulk_delete_users", f"User IDs: {user_ids}")
+    return {"message": "Users deleted", "affected": len(user_ids)}
 
 @admin_router.put("/users/{user_id}/status")
 def update_user_status(user_id: int, is_suspended: bool = None, is_verified: bool = None, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
@@ -54,13 +284,16 @@ def update_user_status(user_id: int, is_suspended: bool = None, is_verified: boo
     
     if is_suspended is not None:
         user.is_suspended = is_suspended
-        utils.log_admin_action(db, current_user.id, "suspend_user" if is_suspended else "reactivate_user", f"User ID: {user_id}")
     
     if is_verified is not None:
         user.is_verified = is_verified
-        utils.log_admin_action(db, current_user.id, "verify_user" if is_verified else "unverify_user", f"User ID: {user_id}")
         
     db.commit()
+    # The audit log is written separately, so only record changes that were committed
+    if is_suspended is not None:
+        utils.log_admin_action(current_user.id, "suspend_user" if is_suspended else "reactivate_user", f"User ID: {user_id}")
+    if is_verified is not None:
+        utils.log_admin_action(current_user.id, "verify_user" if is_verified else "unverify_user", f"User ID: {user_id}")
     return {"message": "User status updated"}
 
 @admin_router.delete("/users/{user_id}")
@@ -69,20 +302,40 @@ def delete_user(user_id: int, db: Session = Depends(database.get_db), current_us
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if user.role == "admin":
+        raise HTTPException(status_code=400, detail="Admin accounts cannot be deleted")
     
-    db.delete(user)
+    _delete_users(db, [models.User.id == user_id])
     db.commit()
-    utils.log_admin_action(db, current_user.id, "delete_user", f"User ID: {user_id}")
+    utils.log_admin_action(current_user.id, "delete_user", f"User ID: {user_id}")
     return {"message": "User deleted"}
 
 # --- REQUESTS ---
 @admin_router.get("/requests", response_model=List[schemas.HelpRequestOut])
-def list_all_requests(status: str = None, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+def list_all_requests(
+    request: Request,
+    response: Response,
+    status: str = None,
+    q: str = None,
+    sort: str = "id",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(auth.get_current_admin)
+):
     auth.check_role(current_user, ["admin"])
-    query = db.query(models.HelpRequest)
-    if status:
-        query = query.filter(models.HelpRequest.status == status)
-    return query.all()
+    cached = versions.check_etag(request, response, db, ["help_requests"], request.url.query)
+    if cached:
+        return cached
+    query = db.query(*serializers.REQUEST_COLUMNS).filter(*_request_filters(status, q))
+    rows = _paginate(query, response, REQUEST_SORT_COLUMNS, sort, order, page, page_size)
+    return serializers.json_response([serializers.request_dict(r) for r in rows], response)
+
+@admin_router.get("/requests/export")
+def export_requests(format: str = "csv", status: str = None, q: str = None, current_user: models.User = Depends(auth.get_current_admin)):
+    auth.check_role(current_user, ["admin"])
+    return _stream_export(REQUEST_EXPORT_COLUMNS, _request_filters(status, q), format, "requests")
 
 @admin_router.put("/requests/{request_id}/reassign")
 def reassign_helper(request_id: int, helper_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
@@ -95,14 +348,14 @@ def reassign_helper(request_id: int, helper_id: int, db: Session = Depends(datab
     
     req.helper_id = helper_id
     db.commit()
-    utils.log_admin_action(db, current_user.id, "reassign_helper", f"Request ID: {request_id}, New Helper: {helper_id}")
+    utils.log_admin_action(current_user.id, "reassign_helper", f"Request ID: {request_id}, New Helper: {helper_id}")
     return {"message": "Helper reassigned"}
 
 # --- CHATS ---
 @admin_router.get("/chats/{request_id}", response_model=List[schemas.MessageOut])
-def view_chat_history(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+def view_chat_history(request_id: int, db: Session = Depends(database.get_read_db), current_user: models.User = Depends(auth.get_current_admin)):
     auth.check_role(current_user, ["admin"])
-    return db.query(models.Message).filter(models.Message.request_id == request_id).all()
+    return serializers.json_response(archive.chat_history(db, request_id))
 
 @admin_router.delete("/messages/{message_id}")
 def delete_message(message_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
@@ -111,31 +364,100 @@ def delete_message(message_id: int, db: Session = Depends(database.get_db), curr
     if not msg:
         raise HTTPException(status_code=404, detail="Message not found")
     
+    # The participants' unread counts may change
+    participants = db.query(models.HelpRequest.student_id, models.HelpRequest.helper_id).filter(models.HelpRequest.id == msg.request_id).first()
+    if participants:
+        versions.touch_users(db, *participants)
     db.delete(msg)
     db.commit()
     return {"message": "Message deleted"}
 
 # --- SETTINGS ---
 @admin_router.get("/settings", response_model=schemas.SystemSettingsOut)
-def get_settings(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+def get_settings(current_user: models.User = Depends(auth.get_current_admin)):
     auth.check_role(current_user, ["admin"])
-    return db.query(models.SystemSettings).first()
+    return settings_cache.cache.get()
 
 @admin_router.put("/settings")
 def update_settings(settings: schemas.SystemSettingsUpdate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
     auth.check_role(current_user, ["admin"])
+    update_data = settings.dict(exclude_unset=True)
+    # Only the notice can be cleared; every other setting always needs a value
+    cleared = [key for key, value in update_data.items() if value is None and key != "platform_notice"]
+    if cleared:
+        raise HTTPException(status_code=400, detail=f"{', '.join(cleared)} cannot be null")
+
     db_settings = db.query(models.SystemSettings).first()
+    if not db_settings:
+        db_settings = settings_cache.default_settings()
+        db.add(db_settings)
     
-    update_data = settings.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_settings, key, value)
     
     db.commit()
-    utils.log_admin_action(db, current_user.id, "update_settings", str(update_data))
+    # Refresh this worker now; others pick up the bumped version on their next poll
+    settings_cache.cache.reload()
+    utils.log_admin_action(current_user.id, "update_settings", str(update_data))
     return {"message": "Settings updated"}
 
 # --- LOGS ---
 @admin_router.get("/logs", response_model=List[schemas.ActivityLogOut])
-def get_logs(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_admin)):
+def get_logs(
+    request: Request,
+    response: Response,
+    action: str = None,
+    user_id: int = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    before_timestamp: datetime.datetime = None,
+    before_id: int = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(auth.get_current_admin)
+):
+    auth.check_role(current_user, ["admin"])
+    cached = versions.check_etag(request, response, db, ["activity_logs"], request.url.query)
+    if cached:
+        return cached
+    query = db.query(models.ActivityLog)
+    if action:
+        query = query.filter(models.ActivityLog.action == action)
+    if user_id is not None:
+        query = query.filter(models.ActivityLog.user_id == user_id)
+    if since:
+        query = query.filter(models.ActivityLog.timestamp >= since)
+    if until:
+        query = query.filter(models.ActivityLog.timestamp < until)
+    
+    # Keyset pagination: pass the (timestamp, id) of the last log from the previous page
+    if before_timestamp and before_id is not None:
+        query = query.filter(
+            tuple_(models.ActivityLog.timestamp, models.ActivityLog.id) < tuple_(before_timestamp, before_id)
+        )
+    
+    return query.order_by(models.ActivityLog.timestamp.desc(), models.ActivityLog.id.desc()).limit(limit).all()
+
+# --- PROFILES ---
+# Recorded by profiling.ProfilingMiddleware for requests sent with "X-Profile: 1"
+@admin_router.get("/profiles")
+def list_profiles(current_user: models.User = Depends(auth.get_current_admin)):
+    auth.check_role(current_user, ["admin"])
+    return profiling.list_profiles()
+
+@admin_router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, current_user: models.User = Depends(auth.get_current_admin)):
+    auth.check_role(current_user, ["admin"])
+    profile = profiling.load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@admin_router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_stacks(profile_id: str, current_user: models.User = Depends(auth.get_current_admin)):
+    # Folded stacks: pipe into flamegraph.pl or open in speedscope
     auth.check_role(current_user, ["admin"])
-    return db.query(models.ActivityLog).order_by(models.ActivityLog.timestamp.desc()).limit(100).all()
+    stacks = profiling.load(profile_id, "folded")
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return stacks
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status, Cookie
 from sqlalchemy.orm import Session
-import models, schemas, auth, database, utils
+import models, schemas, auth, database, utils, settings_cache
 from typing import Optional
 from jose import jwt, JWTError
 
@@ -8,6 +8,11 @@ router = APIRouter(tags=["authentication"])
 
 @router.post("/register", response_model=schemas.UserOut)
 def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    settings = settings_cache.cache.get()
+    domain = (settings.allowed_email_domain or "").lower().lstrip("@")
+    if domain and not user.email.lower().endswith("@" + domain):
+        raise HTTPException(status_code=400, detail=f"Registration is restricted to @{domain} email addresses")
+    
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -18,7 +23,9 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         email=user.email,
         hashed_password=hashed_pwd,
         role=user.role,
-        phone_number=user.phone_number
+        phone_number=user.phone_number,
+        # Without admin approval, new accounts are verified immediately
+        is_verified=not settings.admin_approval_required
     )
     db.add(new_user)
     db.commit()
@@ -47,7 +54,7 @@ def login(user_credentials: schemas.UserLogin, response: Response, db: Session =
     
     # Log admin login
     if user.role == "admin":
-        utils.log_admin_action(db, user.id, "login", "Admin logged into dashboard")
+        utils.log_admin_action(user.id, "login", "Admin logged into dashboard")
         
     return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
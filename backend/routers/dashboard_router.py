@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Request
+import asyncio
+import models, schemas, auth, database, serializers, settings_cache
+from routers import requests_router
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+def _load_my_requests(user: models.User) -> list:
+    # Primary session, like /requests/my, so a user's own writes are always visible
+    db = database.SessionLocal()
+    try:
+        return requests_router._my_requests(db, user)
+    finally:
+        db.close()
+
+def _load_open_feed(primary: bool) -> list:
+    db = database.replicas.open_session(primary=primary)
+    try:
+        return requests_router._open_feed(db, limit=requests_router.FEED_PAGE_SIZE)
+    finally:
+        db.close()
+
+async def _no_rows() -> list:
+    return []
+
+@router.get("/bootstrap", response_model=schemas.DashboardBootstrap)
+async def bootstrap(request: Request, current_user: models.User = Depends(auth.get_current_user)):
+    """
+    Everything the dashboard needs on load in one round trip. The independent
+    queries run concurrently in the threadpool, each on its own session.
+    """
+    my_requests, open_requests, settings = await asyncio.gather(
+        asyncio.to_thread(_load_my_requests, current_user),
+        # Only helpers browse the open feed
+        asyncio.to_thread(_load_open_feed, database.recently_wrote(request)) if current_user.role == "helper" else _no_rows(),
+        asyncio.to_thread(settings_cache.cache.get),
+    )
+    return serializers.json_response({
+        "user": serializers.user_dict(current_user),
+        "my_requests": my_requests,
+        "open_requests": open_requests,
+        "platform_notice": settings.platform_notice,
+    })
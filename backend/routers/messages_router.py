@@ -1,10 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-import models, schemas, auth, database
+import models, schemas, auth, database, serializers, archive, unread
+from sqlalchemy import func
 
 router = APIRouter(tags=["messages"])
 
 @router.get("/requests/{request_id}/messages", response_model=List[schemas.MessageOut])
-def get_messages(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return db.query(models.Message).filter(models.Message.request_id == request_id).all()
+def get_messages(request_id: int, db: Session = Depends(database.get_read_db), current_user: models.User = Depends(auth.get_current_user)):
+    return serializers.json_response(archive.chat_history(db, request_id))
+
+@router.put("/requests/{request_id}/messages/read")
+def mark_messages_read(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    req = db.query(models.HelpRequest.student_id, models.HelpRequest.helper_id).filter(models.HelpRequest.id == request_id).first()
+    if not req:
+        raise HTTPException(status_code=404, detail="Request not found")
+    if current_user.id not in (req.student_id, req.helper_id):
+        raise HTTPException(status_code=403, detail="Not a participant of this chat")
+    
+    last_id = db.query(func.max(models.Message.id)).filter(models.Message.request_id == request_id).scalar()
+    if last_id:
+        unread.mark_read(db, current_user.id, request_id, last_id)
+        db.commit()
+    return {"message": "Messages marked as read"}
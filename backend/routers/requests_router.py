@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status, File, UploadFile, Form
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import update, func, or_
 from typing import List, Optional
-import models, schemas, auth, database, utils
+import models, schemas, auth, database, utils, request_states, versions, serializers, settings_cache, unread, thumbnails
 import os, uuid, json
 
 router = APIRouter(prefix="/requests", tags=["requests"])
 
 @router.post("/", response_model=schemas.HelpRequestOut)
 async def create_request(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     subject: str = Form(...),
     description: str = Form(...),
@@ -21,6 +23,8 @@ async def create_request(
     
     # Save files
     attachment_paths = []
+    thumbnail_urls = []
+    thumbnail_jobs = []
     if files:
         for file in files:
             file_ext = os.path.splitext(file.filename)[1]
@@ -33,6 +37,14 @@ async def create_request(
             
             # Store relative URL
             attachment_paths.append(f"/uploads/{file_name}")
+            
+            # Thumbnails are keyed by content hash and rendered after the response is sent
+            if thumbnails.is_previewable(file_name):
+                digest = thumbnails.content_hash(content)
+                thumbnail_urls.append(thumbnails.thumbnail_url(digest))
+                thumbnail_jobs.append((file_path, digest))
+            else:
+                thumbnail_urls.append(None)
 
     new_req = models.HelpRequest(
         title=title,
@@ -41,91 +53,117 @@ async def create_request(
         deadline=utils.parse_datetime(deadline),
         budget=budget,
         student_id=current_user.id,
-        attachments=json.dumps(attachment_paths) if attachment_paths else None
+        attachments=json.dumps(attachment_paths) if attachment_paths else None,
+        thumbnails=json.dumps(thumbnail_urls) if thumbnail_jobs else None
     )
     db.add(new_req)
     db.commit()
     db.refresh(new_req)
     
-    # Prepare for response
-    if new_req.attachments:
-        new_req.attachments = json.loads(new_req.attachments)
-    
-    return new_req
+    if thumbnail_jobs:
+        background_tasks.add_task(thumbnails.pool.enqueue, thumbnail_jobs)
+    return serializers.json_response(serializers.request_dict(new_req))
 
-@router.get("/", response_model=List[schemas.HelpRequestOut])
-def list_requests(status: str = "open", db: Session = Depends(database.get_db)):
-    # Explicitly only show requests with no helper assigned
-    reqs = db.query(models.HelpRequest).filter(
+FEED_PAGE_SIZE = 20
+
+def _open_feed(db: Session, status: str = "open", limit: int = None, offset: int = 0) -> list:
+    # Explicitly only show requests with no helper assigned; newest first
+    query = db.query(*serializers.REQUEST_COLUMNS).filter(
         models.HelpRequest.status == status,
         models.HelpRequest.helper_id == None
-    ).all()
-    
-    for r in reqs:
-        if r.attachments:
-            try:
-                r.attachments = json.loads(r.attachments)
-            except:
-                r.attachments = []
-    return reqs
+    ).order_by(models.HelpRequest.created_at.desc(), models.HelpRequest.id.desc())
+    if limit is not None:
+        query = query.limit(limit).offset(offset)
+    return [serializers.request_dict(r) for r in query.all()]
 
-@router.get("/my", response_model=List[schemas.HelpRequestOut])
-def list_my_requests(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+@router.get("/", response_model=List[schemas.HelpRequestOut])
+def list_requests(
+    request: Request,
+    response: Response,
+    status: str = "open",
+    limit: int = Query(None, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(database.get_read_db)
+):
+    cached = versions.check_etag(request, response, db, ["help_requests"], status, limit, offset)
+    if cached:
+        return cached
+    return serializers.json_response(_open_feed(db, status, limit, offset), response)
+
+def _my_requests(db: Session, current_user: models.User) -> list:
+    # One joined, column-projected query instead of lazy-loading student/helper per row
+    student = aliased(models.User)
+    helper = aliased(models.User)
+    query = db.query(
+        *serializers.REQUEST_COLUMNS,
+        student.name.label("student_name"),
+        student.phone_number.label("student_phone"),
+        helper.name.label("helper_name"),
+        helper.phone_number.label("helper_phone"),
+    ).outerjoin(student, student.id == models.HelpRequest.student_id
+    ).outerjoin(helper, helper.id == models.HelpRequest.helper_id)
+    
     if current_user.role == "student":
-        reqs = db.query(models.HelpRequest).filter(models.HelpRequest.student_id == current_user.id).all()
+        query = query.filter(models.HelpRequest.student_id == current_user.id)
     else:
-        reqs = db.query(models.HelpRequest).filter(models.HelpRequest.helper_id == current_user.id).all()
+        query = query.filter(models.HelpRequest.helper_id == current_user.id)
     
-    # Enrich with names and conditional phone
+    rows = query.all()
+    unread_counts = unread.unread_counts(db, current_user.id, [r.id for r in rows])
+    
+    # Enrich with names, conditional phone and unread counts
     enriched_reqs = []
-    try:
-        for r in reqs:
-            # Handle attachments JSON
-            attachments_list = []
-            if r.attachments:
-                try:
-                    attachments_list = json.loads(r.attachments)
-                except:
-                    attachments_list = []
-
-            if hasattr(schemas.HelpRequestOut, "model_validate"):
-                schema_req = schemas.HelpRequestOut.model_validate(r)
+    for r in rows:
+        data = serializers.request_dict(r)
+        data["unread_count"] = unread_counts.get(r.id, 0)
+        data["attachments"] = data["attachments"] or []
+        data["student_name"] = r.student_name
+        data["helper_name"] = r.helper_name
+        
+        # Phone reveal logic
+        if r.advance_paid and r.helper_id and r.student_id:
+            if current_user.id == r.student_id:
+                data["peer_phone"] = r.helper_phone
             else:
-                schema_req = schemas.HelpRequestOut.from_orm(r)
-            
-            schema_req.attachments = attachments_list
-            schema_req.student_name = r.student.name if r.student else None
-            schema_req.helper_name = r.helper.name if r.helper else None
-            
-            # Phone reveal logic
-            if r.advance_paid and r.helper_id and r.student_id:
-                if current_user.id == r.student_id:
-                    schema_req.peer_phone = r.helper.phone_number
-                else:
-                    schema_req.peer_phone = r.student.phone_number
-            
-            enriched_reqs.append(schema_req)
-    except Exception as e:
-        print(f"Error in list_my_requests loop: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
-    
+                data["peer_phone"] = r.student_phone
+        
+        enriched_reqs.append(data)
     return enriched_reqs
 
-@router.put("/{request_id}/pay-advance")
-def pay_advance(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+@router.get("/my", response_model=List[schemas.HelpRequestOut])
+def list_my_requests(request: Request, response: Response, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    # Peer names/phones only change with the request rows (deleted users are released
+    # from their requests); unread counts are versioned per user
+    cached = versions.check_etag(request, response, db, ["help_requests", versions.user_key(current_user.id)], current_user.id)
+    if cached:
+        return cached
+    
+    return serializers.json_response(_my_requests(db, current_user), response)
+
+def _get_request_or_404(db: Session, request_id: int):
+    # Only used on the failure path of a conditional update, to explain why it matched no row
     req = db.query(models.HelpRequest).filter(models.HelpRequest.id == request_id).first()
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
-    
-    if req.student_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Only the student can pay the advance")
-    
-    if req.status != "in_progress":
+    return req
+
+@router.put("/{request_id}/pay-advance")
+def pay_advance(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    if not settings_cache.cache.get().payment_system_enabled:
+        raise HTTPException(status_code=503, detail="Payments are currently disabled")
+    
+    row = request_states.conditional_update(
+        db, request_id,
+        models.HelpRequest.student_id == current_user.id,
+        models.HelpRequest.status == request_states.IN_PROGRESS,
+        advance_paid=True
+    )
+    if not row:
+        req = _get_request_or_404(db, request_id)
+        if req.student_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Only the student can pay the advance")
         raise HTTPException(status_code=400, detail="Can only pay advance for requests in progress")
 
-    req.advance_paid = True
     db.commit()
     return {"message": "Advance payment successful"}
 
@@ -134,12 +172,13 @@ async def accept_request(request_id: int, db: Session = Depends(database.get_db)
     # Local import to avoid circularity if possible, though utils and separate sio would be better
     from main import sio
     auth.check_role(current_user, ["helper"])
-    req = db.query(models.HelpRequest).filter(models.HelpRequest.id == request_id).first()
-    if not req or req.status != "open" or req.helper_id is not None:
+    row = request_states.transition(
+        db, request_id, "accept",
+        models.HelpRequest.helper_id == None,
+        helper_id=current_user.id
+    )
+    if not row:
         raise HTTPException(status_code=400, detail="Request no longer available")
-    
-    req.helper_id = current_user.id
-    req.status = "in_progress"
     db.commit()
     
     # Broadcast to all connected clients that this request is no longer available
@@ -149,32 +188,43 @@ async def accept_request(request_id: int, db: Session = Depends(database.get_db)
 
 @router.put("/{request_id}/complete")
 def complete_request(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    req = db.query(models.HelpRequest).filter(models.HelpRequest.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    
-    if req.student_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Only student can complete the request")
-    
-    req.status = "completed"
-    if req.helper:
-        req.helper.completed_tasks += 1
+    row = request_states.transition(
+        db, request_id, "complete",
+        models.HelpRequest.student_id == current_user.id
+    )
+    if not row:
+        req = _get_request_or_404(db, request_id)
+        if req.student_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Only student can complete the request")
+        if not request_states.can_transition("complete", req.status):
+            raise HTTPException(status_code=400, detail=f"Cannot complete a request that is {req.status}")
+        # Legal now, so its status changed under us between the update and this read
+        raise HTTPException(status_code=409, detail="Request was modified concurrently, please retry")
+    
+    if row.helper_id:
+        db.execute(
+            update(models.User)
+            .where(models.User.id == row.helper_id)
+            .values(completed_tasks=func.coalesce(models.User.completed_tasks, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
     
     db.commit()
     return {"message": "Request marked as completed"}
 
 @router.put("/{request_id}/cancel")
 def cancel_request(request_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    req = db.query(models.HelpRequest).filter(models.HelpRequest.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    
-    if req.student_id != current_user.id and (req.helper_id != current_user.id):
-        raise HTTPException(status_code=403, detail="You are not authorized to cancel this request")
-
-    if req.status == "completed":
-        raise HTTPException(status_code=400, detail="Cannot cancel a completed request")
+    row = request_states.transition(
+        db, request_id, "cancel",
+        or_(models.HelpRequest.student_id == current_user.id, models.HelpRequest.helper_id == current_user.id)
+    )
+    if not row:
+        req = _get_request_or_404(db, request_id)
+        if req.student_id != current_user.id and (req.helper_id != current_user.id):
+            raise HTTPException(status_code=403, detail="You are not authorized to cancel this request")
+        if not request_states.can_transition("cancel", req.status):
+            raise HTTPException(status_code=400, detail=f"Cannot cancel a request that is {req.status}")
+        raise HTTPException(status_code=409, detail="Request was modified concurrently, please retry")
     
-    req.status = "cancelled"
     db.commit()
     return {"message": "Request cancelled"}
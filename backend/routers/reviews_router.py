@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import update, func
+import models, schemas, auth, database, request_states
+
+router = APIRouter(prefix="/reviews", tags=["reviews"])
+
+def apply_rating(db: Session, helper_id: int, rating: int):
+    # Incrementally maintain the helper's aggregate instead of recomputing over all reviews.
+    # Right-hand side columns refer to the pre-update values.
+    rating_sum = func.coalesce(models.User.rating_sum, 0)
+    rating_count = func.coalesce(models.User.rating_count, 0)
+    db.execute(
+        update(models.User)
+        .where(models.User.id == helper_id)
+        .values(
+            rating_sum=rating_sum + rating,
+            rating_count=rating_count + 1,
+            rating=(rating_sum + rating) / (rating_count + 1)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+@router.post("/", response_model=schemas.ReviewOut)
+def create_review(review: schemas.ReviewCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    req = db.query(models.HelpRequest).filter(models.HelpRequest.id == review.request_id).first()
+    if not req:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    if req.student_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the student can review this request")
+    
+    if req.status != request_states.COMPLETED or not req.helper_id:
+        raise HTTPException(status_code=400, detail="Only completed requests can be reviewed")
+
+    new_review = models.Review(request_id=req.id, rating=review.rating, feedback=review.feedback)
+    db.add(new_review)
+    try:
+        # Flush first so the unique request_id constraint rejects duplicates before the rating moves
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Request already reviewed")
+    
+    apply_rating(db, req.helper_id, review.rating)
+    db.commit()
+    db.refresh(new_review)
+    return new_review
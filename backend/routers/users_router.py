@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends
-import models, schemas, auth
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+import models, schemas, auth, database, versions
 
 router = APIRouter(tags=["users"])
 
 @router.get("/me", response_model=schemas.UserOut)
-def get_me(current_user: models.User = Depends(auth.get_current_user)):
+def get_me(request: Request, response: Response, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    cached = versions.check_etag(request, response, db, ["users"], current_user.id)
+    if cached:
+        return cached
+    # The dependency loaded the user before the version was read; re-read it so a
+    # write committed in between is not served under the newer ETag
+    db.refresh(current_user)
     return current_user
@@ -0,0 +1,77 @@
+import asyncio
+import datetime
+import os
+from sqlalchemy import select, update
+import database, models, request_states
+
+# Periodic background jobs, started from the app lifespan. Every worker runs the
+# same jobs; each job must be safe to run concurrently on several workers.
+EXPIRY_INTERVAL_SECONDS = float(os.getenv("EXPIRY_INTERVAL_SECONDS", "60"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+
+class Scheduler:
+    def __init__(self):
+        self._jobs = []
+        self._tasks = []
+
+    def every(self, seconds: float, job):
+        """Register an async callable to run every `seconds`."""
+        self._jobs.append((seconds, job))
+
+    async def _loop(self, seconds: float, job):
+        while True:
+            await asyncio.sleep(seconds)
+            try:
+                await job()
+            except Exception as e:
+                print(f"Error in scheduled job {job.__name__}: {e}")
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._loop(seconds, job)) for seconds, job in self._jobs]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+def expire_overdue_requests(batch_size: int = EXPIRY_BATCH_SIZE) -> list:
+    """
+    Move open requests past their deadline to expired, batch_size rows per
+    UPDATE, and return the expired ids. Candidates are locked with
+    FOR UPDATE SKIP LOCKED, so workers running this at the same time split the
+    rows between them instead of blocking or double-processing.
+    """
+    sources, target = request_states.TRANSITIONS["expire"]
+    expired_ids = []
+    while True:
+        db = database.SessionLocal()
+        try:
+            candidates = (
+                select(models.HelpRequest.id)
+                .where(
+                    models.HelpRequest.status.in_(sources),
+                    models.HelpRequest.deadline < datetime.datetime.utcnow()
+                )
+                .order_by(models.HelpRequest.deadline)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            result = db.execute(
+                update(models.HelpRequest)
+                .where(models.HelpRequest.id.in_(candidates), models.HelpRequest.status.in_(sources))
+                .values(status=target, closed_at=datetime.datetime.utcnow())
+                .returning(models.HelpRequest.id)
+                .execution_options(synchronize_session=False)
+            )
+            batch = [row.id for row in result]
+            db.commit()
+        finally:
+            db.close()
+        
+        expired_ids.extend(batch)
+        if len(batch) < batch_size:
+            return expired_ids
+
+scheduler = Scheduler()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -18,6 +18,7 @@ class UserLogin(BaseModel):
 class UserOut(UserBase):
     id: int
     rating: float
+    rating_count: int = 0
     completed_tasks: int
     is_suspended: bool
     is_verified: bool
@@ -56,6 +57,20 @@ class SystemSettingsUpdate(BaseModel):
     payment_system_enabled: Optional[bool] = None
     platform_notice: Optional[str] = None
 
+class BulkUserSelection(BaseModel):
+    # Explicit ids, or filters; at least one must be given
+    user_ids: Optional[List[int]] = None
+    role: Optional[str] = None
+    verified: Optional[bool] = None
+
+class BulkUserStatusUpdate(BulkUserSelection):
+    is_suspended: Optional[bool] = None
+    is_verified: Optional[bool] = None
+
+class BulkResult(BaseModel):
+    message: str
+    affected: int
+
 class ActivityLogOut(BaseModel):
     id: int
     user_id: int
@@ -93,17 +108,25 @@ class HelpRequestOut(HelpRequestBase):
     status: str
     advance_paid: bool = False
     attachments: Optional[List[str]] = None
+    thumbnails: Optional[List[Optional[str]]] = None
     created_at: datetime
     
     # We will compute these in the response manually to ensure security
     student_name: Optional[str] = None
     helper_name: Optional[str] = None
     peer_phone: Optional[str] = None
+    unread_count: int = 0
 
     class Config:
         orm_mode = True
         from_attributes = True
 
+class DashboardBootstrap(BaseModel):
+    user: UserOut
+    my_requests: List[HelpRequestOut]
+    open_requests: List[HelpRequestOut] = []
+    platform_notice: Optional[str] = None
+
 class MessageBase(BaseModel):
     content: str
 
@@ -122,7 +145,7 @@ class MessageOut(MessageBase):
 
 class ReviewCreate(BaseModel):
     request_id: int
-    rating: int
+    rating: int = Field(..., ge=1, le=5)
     feedback: str
 
 class ReviewOut(ReviewCreate):
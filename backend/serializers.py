@@ -0,0 +1,67 @@
+import json
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+import models
+
+# Fast path for list endpoints: queries select only the columns a schema needs,
+# rows become plain dicts, and orjson encodes them. Rows are built by the server
+# from the database, so per-object Pydantic validation is skipped; the
+# response_model on each route still documents the shape.
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+def json_response(content, response: Response = None):
+    # Returning a Response bypasses FastAPI's merge of the injected response's headers (e.g. ETag)
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return FastJSONResponse(content, headers=headers)
+
+# Column projections matching schemas.HelpRequestOut / UserOut / MessageOut / ActivityLogOut
+REQUEST_COLUMNS = (
+    models.HelpRequest.id, models.HelpRequest.title, models.HelpRequest.subject,
+    models.HelpRequest.description, models.HelpRequest.deadline, models.HelpRequest.budget,
+    models.HelpRequest.student_id, models.HelpRequest.helper_id, models.HelpRequest.status,
+    models.HelpRequest.advance_paid, models.HelpRequest.attachments, models.HelpRequest.thumbnails,
+    models.HelpRequest.created_at,
+)
+USER_COLUMNS = (
+    models.User.id, models.User.name, models.User.email, models.User.role, models.User.phone_number,
+    models.User.rating, models.User.rating_count, models.User.completed_tasks,
+    models.User.is_suspended, models.User.is_verified, models.User.created_at,
+)
+MESSAGE_COLUMNS = (
+    models.Message.id, models.Message.request_id, models.Message.sender_id,
+    models.Message.content, models.Message.timestamp,
+)
+
+def parse_attachments(raw):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return []
+
+def request_dict(row) -> dict:
+    """Row (or ORM object) with REQUEST_COLUMNS -> HelpRequestOut-shaped dict."""
+    data = {column.key: getattr(row, column.key) for column in REQUEST_COLUMNS}
+    data["attachments"] = parse_attachments(data["attachments"])
+    data["thumbnails"] = parse_attachments(data["thumbnails"])
+    data["student_name"] = None
+    data["helper_name"] = None
+    data["peer_phone"] = None
+    data["unread_count"] = 0
+    return data
+
+def user_dict(row) -> dict:
+    """Row (or ORM object) with USER_COLUMNS -> UserOut-shaped dict."""
+    return {column.key: getattr(row, column.key) for column in USER_COLUMNS}
+
+def row_dicts(rows) -> list:
+    return [row._asdict() for row in rows]
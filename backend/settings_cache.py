@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+import database, models, schemas, versions
+
+# Process-wide SystemSettings cache. Hot paths call cache.get() and never touch the
+# database. Writes bump the system_settings change counter (see database.py); each
+# worker polls that single counter and reloads when it moves, so an update made on
+# one worker reaches the others within POLL_INTERVAL_SECONDS.
+POLL_INTERVAL_SECONDS = float(os.getenv("SETTINGS_POLL_INTERVAL_SECONDS", "5"))
+TABLE = models.SystemSettings.__tablename__
+
+def _column_defaults() -> dict:
+    columns = models.SystemSettings.__table__.columns
+    return {c.key: c.default.arg for c in columns if c.default is not None and not c.default.is_callable}
+
+def default_settings() -> models.SystemSettings:
+    # Unsaved row with the column defaults. The read path never inserts: migrate.py
+    # seeds the real row, and two workers starting together would both insert one.
+    return models.SystemSettings(**_column_defaults())
+
+def to_schema(row: models.SystemSettings) -> schemas.SystemSettingsOut:
+    # The columns are nullable; a NULL in a required setting falls back to its default
+    # rather than failing validation on every hot path
+    values = {c.key: getattr(row, c.key) for c in models.SystemSettings.__table__.columns}
+    for key, default in _column_defaults().items():
+        if key in values and values[key] is None:
+            values[key] = default
+    return schemas.SystemSettingsOut(**values)
+
+class SettingsCache:
+    def __init__(self, interval: float = POLL_INTERVAL_SECONDS):
+        self.interval = interval
+        self._settings = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._task = None
+
+    def get(self) -> schemas.SystemSettingsOut:
+        settings = self._settings
+        if settings is None:
+            # Only the first call in a process pays for the load
+            settings = self.reload()
+        return settings
+
+    def reload(self) -> schemas.SystemSettingsOut:
+        with self._lock:
+            db = database.SessionLocal()
+            try:
+                version = versions.current_versions(db, [TABLE])[TABLE]
+                row = db.query(models.SystemSettings).first() or default_settings()
+                self._settings = to_schema(row)
+                self._version = version
+                return self._settings
+            finally:
+                db.close()
+
+    def _check_version(self):
+        db = database.SessionLocal()
+        try:
+            version = versions.current_versions(db, [TABLE])[TABLE]
+        finally:
+            db.close()
+        if version != self._version:
+            self.reload()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self._check_version)
+            except Exception as e:
+                print(f"Error refreshing settings cache: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+cache = SettingsCache()
@@ -0,0 +1,111 @@
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import threading
+
+# Attachment previews. Thumbnails are rendered on a bounded process pool after the
+# upload response has been sent, and cached on disk by content hash, so identical
+# files share one thumbnail and a re-render is never needed.
+# Pillow renders images; PyMuPDF renders the first page of PDFs. Either is optional:
+# without it, that file type simply gets no thumbnail.
+THUMB_DIR = os.path.join("uploads", "thumbs")
+THUMB_SIZE = (320, 320)
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"}
+PDF_EXTENSIONS = {".pdf"}
+MAX_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("THUMBNAIL_MAX_PENDING", "100"))
+# Workers are spawned, not forked: forking the threaded server process can leave a
+# child holding a copy of a lock (e.g. the import lock) that no thread will release
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+def is_previewable(path: str) -> bool:
+    ext = os.path.splitext(path)[1].lower()
+    return ext in IMAGE_EXTENSIONS or ext in PDF_EXTENSIONS
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def thumbnail_path(digest: str) -> str:
+    return os.path.join(THUMB_DIR, f"{digest}.jpg")
+
+def thumbnail_url(digest: str) -> str:
+    return f"/uploads/thumbs/{digest}.jpg"
+
+def render(source_path: str, digest: str) -> bool:
+    """Render one thumbnail. Runs in a worker process; returns False if it could not."""
+    dest = thumbnail_path(digest)
+    if os.path.exists(dest):
+        return True
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+
+    ext = os.path.splitext(source_path)[1].lower()
+    try:
+        if ext in PDF_EXTENSIONS:
+            try:
+                import pymupdf
+            except ImportError:
+                return False
+            with pymupdf.open(source_path) as doc:
+                page = doc[0]
+                # Render just large enough for the thumbnail box
+                zoom = min(THUMB_SIZE[0] / page.rect.width, THUMB_SIZE[1] / page.rect.height) * 2
+                pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom))
+                image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        else:
+            image = Image.open(source_path)
+            image.draft("RGB", THUMB_SIZE)  # lets JPEG decoding downscale cheaply
+
+        image.thumbnail(THUMB_SIZE)
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        # Write then rename, so a half-written file is never served
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        image.convert("RGB").save(tmp, "JPEG", quality=80)
+        os.replace(tmp, dest)
+        return True
+    except Exception as e:
+        print(f"Error rendering thumbnail for {source_path}: {e}")
+        return False
+
+class ThumbnailPool:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self.max_workers = max_workers
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, mp_context=MP_CONTEXT)
+            return self._executor
+
+    def enqueue(self, jobs: list):
+        """Queue (source_path, digest) jobs. When the queue is full, jobs are dropped; backfill_thumbnails.py finds their missing files and renders them later."""
+        executor = self._get_executor()
+        for source_path, digest in jobs:
+            if os.path.exists(thumbnail_path(digest)):
+                continue
+            if not self._pending.acquire(blocking=False):
+                print(f"Thumbnail queue full, skipping {source_path}")
+                continue
+            future = executor.submit(render, source_path, digest)
+            future.add_done_callback(lambda _: self._pending.release())
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+pool = ThumbnailPool()
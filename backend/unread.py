@@ -0,0 +1,35 @@
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+import database, models, versions
+
+# Unread chat counts from per-(user, request) read pointers. A message is unread
+# for a user if someone else sent it and its id is above the user's pointer.
+
+def unread_counts(db: Session, user_id: int, request_ids: list) -> dict:
+    """Unread counts for all given requests in one grouped query: {request_id: count}."""
+    if not request_ids:
+        return {}
+    rows = db.query(models.Message.request_id, func.count(models.Message.id)).outerjoin(
+        models.ChatReadPointer,
+        and_(
+            models.ChatReadPointer.request_id == models.Message.request_id,
+            models.ChatReadPointer.user_id == user_id
+        )
+    ).filter(
+        models.Message.request_id.in_(request_ids),
+        models.Message.sender_id != user_id,
+        models.Message.id > func.coalesce(models.ChatReadPointer.last_read_message_id, 0)
+    ).group_by(models.Message.request_id).all()
+    return dict(rows)
+
+def mark_read(db: Session, user_id: int, request_id: int, message_id: int):
+    """Move the user's pointer forward to message_id (never backwards). Does not commit."""
+    insert = database.dialect_insert(db)
+    pointer = models.ChatReadPointer.__table__.c.last_read_message_id
+    stmt = insert(models.ChatReadPointer).values(user_id=user_id, request_id=request_id, last_read_message_id=message_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.ChatReadPointer.user_id, models.ChatReadPointer.request_id],
+        set_={"last_read_message_id": case((pointer < stmt.excluded.last_read_message_id, stmt.excluded.last_read_message_id), else_=pointer)}
+    )
+    db.execute(stmt)
+    versions.touch_users(db, user_id)
@@ -1,6 +1,5 @@
-from sqlalchemy.orm import Session
 from datetime import datetime
-import models
+import audit
 
 def parse_datetime(dt_str: str) -> datetime:
     if not dt_str:
@@ -11,11 +10,6 @@ def parse_datetime(dt_str: str) -> datetime:
     except Exception:
         return datetime.utcnow()
 
-def log_admin_action(db: Session, user_id: int, action: str, details: str = None):
-    try:
-        log = models.ActivityLog(user_id=user_id, action=action, details=details)
-        db.add(log)
-        db.commit()
-    except Exception as e:
-        print(f"Error logging admin action: {e}")
-        db.rollback()
+def log_admin_action(user_id: int, action: str, details: str = None):
+    # Buffered: written in batches by audit.writer, never commits the caller's session
+    audit.writer.log(user_id, action, details)
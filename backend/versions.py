@@ -0,0 +1,43 @@
+import hashlib
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import database, models
+
+# ETags from the change counters kept by database.py. Hot GET endpoints derive
+# their ETag from the versions of the tables (and per-user keys) they read and
+# answer 304 before running their real query.
+
+def user_key(user_id: int) -> str:
+    # Per-user counter for data only that user sees (chat unread counts)
+    return f"user:{user_id}"
+
+def touch_users(db: Session, *user_ids):
+    database.touch(db, *[user_key(user_id) for user_id in user_ids if user_id is not None])
+
+def current_versions(db: Session, tables: list) -> dict:
+    rows = db.execute(
+        select(models.ChangeCounter.table_name, models.ChangeCounter.version)
+        .where(models.ChangeCounter.table_name.in_(tables))
+    )
+    versions = {table: 0 for table in tables}
+    versions.update({row.table_name: row.version for row in rows})
+    return versions
+
+def etag_for(db: Session, tables: list, *parts) -> str:
+    versions = current_versions(db, tables)
+    key = "|".join([f"{t}:{versions[t]}" for t in sorted(versions)] + [str(p) for p in parts])
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+def check_etag(request: Request, response: Response, db: Session, tables: list, *parts):
+    """
+    Compute the ETag for a response built from `tables` (plus any per-user or
+    per-query parts). Returns a 304 response if the client already has it,
+    otherwise sets the caching headers on `response` and returns None.
+    """
+    etag = etag_for(db, tables, *parts)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -5,6 +5,8 @@
 
 document.addEventListener('DOMContentLoaded', async () => {
     const API_BASE_URL = 'http://localhost:8000/api/v1';
+    const PAGE_SIZE = 50;
+    const pageState = { users: 1, requests: 1 };
 
     // Initial Session Validation
     async function validateSession() {
@@ -46,6 +48,10 @@ document.addEventListener('DOMContentLoaded', async () => {
             }
         };
 
+        // Read-your-writes: echo the time of our last write so reads go to the primary
+        const lastWrite = localStorage.getItem('last_write');
+        if (lastWrite) fetchOptions.headers['X-Last-Write'] = lastWrite;
+
         try {
             let response = await fetch(`${API_BASE_URL}${url}`, fetchOptions);
 
@@ -67,6 +73,10 @@ document.addEventListener('DOMContentLoaded', async () => {
                 }
             }
 
+            if (response.headers.get('X-Last-Write')) {
+                localStorage.setItem('last_write', response.headers.get('X-Last-Write'));
+            }
+
             if (!response.ok) {
                 const errorData = await response.json();
                 console.error(`API Error (${url}):`, errorData.detail || 'Unknown error');
@@ -201,8 +211,28 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }
 
+    function userListParams() {
+        const params = new URLSearchParams();
+        const role = document.getElementById('roleFilter')?.value;
+        const search = document.getElementById('userSearch')?.value.trim();
+        if (role) params.set('role', role);
+        if (search) params.set('q', search);
+        return params;
+    }
+
+    function requestListParams() {
+        const params = new URLSearchParams();
+        const status = document.getElementById('requestStatusFilter')?.value;
+        if (status) params.set('status', status);
+        return params;
+    }
+
     async function loadUsers() {
-        const users = await apiFetch('/admin/users');
+        const params = userListParams();
+        params.set('page', pageState.users);
+        params.set('page_size', PAGE_SIZE);
+        const users = await apiFetch(`/admin/users?${params}`);
+        document.getElementById('usersPageLabel').textContent = `Page ${pageState.users}`;
         const tbody = document.getElementById('usersTableBody');
         if (!tbody || !users) return;
         tbody.innerHTML = '';
@@ -210,6 +240,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         users.forEach(u => {
             const tr = document.createElement('tr');
             tr.innerHTML = `
+                <td><input type="checkbox" class="user-select" value="${u.id}"></td>
                 <td>${u.id}</td>
                 <td>${u.name}</td>
                 <td>${u.email}</td>
@@ -222,10 +253,22 @@ document.addEventListener('DOMContentLoaded', async () => {
             `;
             tbody.appendChild(tr);
         });
+
+        const selectAll = document.getElementById('selectAllUsers');
+        if (selectAll) {
+            selectAll.checked = false;
+            selectAll.onchange = () => {
+                document.querySelectorAll('.user-select').forEach(cb => cb.checked = selectAll.checked);
+            };
+        }
     }
 
     async function loadRequests() {
-        const reqs = await apiFetch('/admin/requests');
+        const params = requestListParams();
+        params.set('page', pageState.requests);
+        params.set('page_size', PAGE_SIZE);
+        const reqs = await apiFetch(`/admin/requests?${params}`);
+        document.getElementById('requestsPageLabel').textContent = `Page ${pageState.requests}`;
         const tbody = document.getElementById('requestsTableBody');
         if (!tbody) return;
         tbody.innerHTML = '';
@@ -283,6 +326,69 @@ document.addEventListener('DOMContentLoaded', async () => {
         loadSectionData(window.location.hash.replace('#', '') || 'overview');
     };
 
+    window.changePage = (table, delta) => {
+        const rows = document.querySelectorAll(`#${table}TableBody tr`).length;
+        // A short page means there is nothing after it
+        if (delta > 0 && rows < PAGE_SIZE) return;
+        pageState[table] = Math.max(1, pageState[table] + delta);
+        if (table === 'users') loadUsers();
+        else loadRequests();
+    };
+
+    // Streamed server-side; downloaded through fetch so the bearer token is sent
+    window.exportTable = async (table) => {
+        const params = table === 'users' ? userListParams() : requestListParams();
+        params.set('format', 'csv');
+        const res = await fetch(`${API_BASE_URL}/admin/${table}/export?${params}`, {
+            headers: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` }
+        });
+        if (!res.ok) {
+            alert('Export failed');
+            return;
+        }
+        const url = URL.createObjectURL(await res.blob());
+        const link = document.createElement('a');
+        link.href = url;
+        link.download = `${table}.csv`;
+        link.click();
+        URL.revokeObjectURL(url);
+    };
+
+    const userSearch = document.getElementById('userSearch');
+    if (userSearch) {
+        userSearch.addEventListener('change', () => { pageState.users = 1; loadUsers(); });
+    }
+    const roleFilter = document.getElementById('roleFilter');
+    if (roleFilter) {
+        roleFilter.addEventListener('change', () => { pageState.users = 1; loadUsers(); });
+    }
+    const requestStatusFilter = document.getElementById('requestStatusFilter');
+    if (requestStatusFilter) {
+        requestStatusFilter.addEventListener('change', () => { pageState.requests = 1; loadRequests(); });
+    }
+
+    // Bulk actions: one request for all selected users instead of one per user
+    window.bulkUserAction = async (action) => {
+        const userIds = Array.from(document.querySelectorAll('.user-select:checked')).map(cb => parseInt(cb.value));
+        if (userIds.length === 0) {
+            alert('Select at least one user.');
+            return;
+        }
+
+        let res;
+        if (action === 'verify') {
+            res = await apiFetch('/admin/users/bulk/status', { method: 'PUT', body: JSON.stringify({ user_ids: userIds, is_verified: true }) });
+        } else if (action === 'suspend') {
+            res = await apiFetch('/admin/users/bulk/status', { method: 'PUT', body: JSON.stringify({ user_ids: userIds, is_suspended: true }) });
+        } else if (action === 'delete') {
+            if (!confirm(`Delete ${userIds.length} users and their requests? This cannot be undone.`)) return;
+            res = await apiFetch('/admin/users/bulk/delete', { method: 'POST', body: JSON.stringify({ user_ids: userIds }) });
+        }
+
+        if (res) alert(`${res.message} (${res.affected} users)`);
+        loadUsers();
+    };
+
     // Run session validation
     await validateSession();
 });
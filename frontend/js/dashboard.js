@@ -8,6 +8,8 @@ document.addEventListener('DOMContentLoaded', async () => {
     const API_BASE_URL = 'http://localhost:8000/api/v1';
     let socket;
     let currentChatId = null;
+    const unreadCounts = {};
+    const FEED_PAGE_SIZE = 20;
 
     // Initial Session Validation
     async function validateSession() {
@@ -21,11 +23,12 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         const user = JSON.parse(userStr);
         try {
-            const verifiedUser = await apiFetch('/users/me');
-            if (!verifiedUser) return;
+            // Profile, own requests, first feed page and notice in one round trip
+            const data = await apiFetch('/dashboard/bootstrap');
+            if (!data) return;
 
-            localStorage.setItem('user', JSON.stringify(verifiedUser));
-            setupDashboard(verifiedUser);
+            localStorage.setItem('user', JSON.stringify(data.user));
+            setupDashboard(data);
         } catch (err) {
             console.error('Session validation failed', err);
             window.location.href = 'login.html';
@@ -44,6 +47,10 @@ document.addEventListener('DOMContentLoaded', async () => {
             ...(options.headers || {})
         };
 
+        // Read-your-writes: echo the time of our last write so reads go to the primary
+        const lastWrite = localStorage.getItem('last_write');
+        if (lastWrite) headers['X-Last-Write'] = lastWrite;
+
         // Automatic content-type for JSON, none for FormData
         if (options.body && !(options.body instanceof FormData)) {
             headers['Content-Type'] = 'application/json';
@@ -71,6 +78,10 @@ document.addEventListener('DOMContentLoaded', async () => {
                 }
             }
 
+            if (response.headers.get('X-Last-Write')) {
+                localStorage.setItem('last_write', response.headers.get('X-Last-Write'));
+            }
+
             if (!response.ok) {
                 const errorData = await response.json();
                 console.error(`API Error (${url}):`, errorData.detail || 'Unknown error');
@@ -101,43 +112,89 @@ document.addEventListener('DOMContentLoaded', async () => {
         return false;
     }
 
-    function setupDashboard(user) {
+    function setupDashboard(data) {
+        const user = data.user;
         document.getElementById('userName').textContent = `Hello, ${user.name} (${user.role})`;
+        renderNotice(data.platform_notice);
 
         if (user.role === 'student') {
             document.getElementById('studentDashboard').style.display = 'block';
-            fetchStudentData();
+            renderStudentData(data.my_requests);
         } else if (user.role === 'helper') {
             document.getElementById('helperDashboard').style.display = 'block';
-            fetchAvailableRequests();
-            fetchHelperHistory();
+            renderAvailableRequests(data.open_requests);
+            renderHelperHistory(data.my_requests);
         }
 
-        socket = io('http://localhost:8000');
+        // The server authenticates the socket from the token (read again on every reconnect)
+        socket = io('http://localhost:8000', {
+            auth: (cb) => cb({ token: localStorage.getItem('access_token') })
+        });
         socket.on('new_message', (data) => {
             if (data.request_id === currentChatId) appendMessage(data, user.id);
         });
 
-        socket.on('request_accepted', (data) => {
-            const card = document.getElementById(`request-available-${data.request_id}`);
-            if (card) {
-                card.style.opacity = '0';
-                setTimeout(() => {
-                    card.remove();
-                    const container = document.getElementById('availableRequests');
-                    if (container && container.children.length === 0) {
-                        container.innerHTML = '<p style="color: var(--secondary);">No active academic support requests at the moment.</p>';
-                    }
-                }, 300);
-            }
+        socket.on('unread_update', (data) => {
+            // The open chat is being read as messages arrive
+            if (data.request_id === currentChatId) markChatRead(data.request_id);
+            else setUnread(data.request_id, data.unread_count);
+        });
+
+        socket.on('request_accepted', (data) => removeAvailableCard(data.request_id));
+
+        socket.on('requests_expired', (data) => {
+            data.request_ids.forEach(removeAvailableCard);
+            if (user.role === 'student') fetchStudentData();
         });
     }
 
-    function renderAttachments(attachments) {
+    function renderNotice(notice) {
+        const banner = document.getElementById('platformNotice');
+        if (!banner) return;
+        banner.textContent = notice || '';
+        banner.style.display = notice ? 'block' : 'none';
+    }
+
+    function removeAvailableCard(requestId) {
+        const card = document.getElementById(`request-available-${requestId}`);
+        if (card) {
+            card.style.opacity = '0';
+            setTimeout(() => {
+                card.remove();
+                const container = document.getElementById('availableRequests');
+                if (container && container.children.length === 0) {
+                    container.innerHTML = '<p style="color: var(--secondary);">No active academic support requests at the moment.</p>';
+                }
+            }, 300);
+        }
+    }
+
+    function renderUnread(req) {
+        unreadCounts[req.id] = req.unread_count || 0;
+        return `<span class="unread-count" id="unread-${req.id}">${req.unread_count ? ` (${req.unread_count})` : ''}</span>`;
+    }
+
+    function setUnread(requestId, count) {
+        unreadCounts[requestId] = count;
+        const span = document.getElementById(`unread-${requestId}`);
+        if (span) span.textContent = count ? ` (${count})` : '';
+        updateChatBadge();
+    }
+
+    async function markChatRead(requestId) {
+        const res = await apiFetch(`/requests/${requestId}/messages/read`, { method: 'PUT' });
+        if (res) setUnread(requestId, 0);
+    }
+
+    function renderAttachments(attachments, thumbnails) {
         if (!attachments || attachments.length === 0) return '';
         const links = attachments.map((path, index) => {
             const fileName = path.split('/').pop();
-            return `<a href="http://localhost:8000${path}" target="_blank" class="attachment-link"><i class="fas fa-file-alt"></i> ${fileName}</a>`;
+            // Thumbnails render in the background; until one exists the image is dropped and the icon shows
+            const thumb = thumbnails && thumbnails[index]
+                ? `<img src="http://localhost:8000${thumbnails[index]}" class="attachment-thumb" loading="lazy" alt="" onerror="this.remove()">`
+                : '';
+            return `<a href="http://localhost:8000${path}" target="_blank" class="attachment-link">${thumb}<i class="fas fa-file-alt"></i> ${fileName}</a>`;
         }).join('');
         return `<div class="attachments-section"><p><strong>Attachments:</strong></p><div class="attachment-grid">${links}</div></div>`;
     }
@@ -145,7 +202,10 @@ document.addEventListener('DOMContentLoaded', async () => {
     async function fetchStudentData() {
         const requests = await apiFetch('/requests/my');
         if (!requests || !Array.isArray(requests)) return;
+        renderStudentData(requests);
+    }
 
+    function renderStudentData(requests) {
         const activeContainer = document.getElementById('studentRequests');
         const historyContainer = document.getElementById('studentHistory');
         if (!activeContainer || !historyContainer) return;
@@ -156,7 +216,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         requests.forEach(req => {
             const card = document.createElement('div');
             card.className = 'feature-card';
-            const isHistorical = req.status === 'completed' || req.status === 'cancelled';
+            const isHistorical = req.status === 'completed' || req.status === 'cancelled' || req.status === 'expired';
             const canPayAdvance = req.status === 'in_progress' && !req.advance_paid;
 
             card.innerHTML = `
@@ -166,9 +226,9 @@ document.addEventListener('DOMContentLoaded', async () => {
                 ${req.peer_phone ? `<p style="color: var(--primary); font-weight: 700;"><i class="fas fa-phone"></i> Contact: <a href="tel:${req.peer_phone}">${req.peer_phone}</a></p>` : ''}
                 <p><strong>Status:</strong> <span class="badge status-${req.status}">${req.status}</span></p>
                 <p>${req.description.substring(0, 100)}...</p>
-                ${renderAttachments(req.attachments)}
+                ${renderAttachments(req.attachments, req.thumbnails)}
                 <div style="margin-top: 1rem; display: flex; flex-wrap: wrap; gap: 0.5rem;">
-                    <button onclick="viewChat(${req.id}, '${req.title}')" class="btn btn-outline" style="flex: 1;">Chat</button>
+                    <button onclick="viewChat(${req.id}, '${req.title}')" class="btn btn-outline" style="flex: 1;">Chat${renderUnread(req)}</button>
                     ${canPayAdvance ? `<button onclick="payAdvance(${req.id})" class="btn btn-primary" style="flex: 1; background-color: #059669;">Pay Advance</button>` : ''}
                     ${!isHistorical && req.status === 'in_progress' ? `<button onclick="markCompleted(${req.id})" class="btn btn-primary" style="flex: 1;">Complete</button>` : ''}
                 </div>
@@ -178,13 +238,10 @@ document.addEventListener('DOMContentLoaded', async () => {
         });
 
         if (historyContainer.innerHTML === '') historyContainer.innerHTML = '<p style="color: var(--secondary);">No history yet.</p>';
-        updateChatBadge(requests);
+        updateChatBadge();
     }
 
-    async function fetchHelperHistory() {
-        const requests = await apiFetch('/requests/my');
-        if (!requests || !Array.isArray(requests)) return;
-
+    function renderHelperHistory(requests) {
         const container = document.getElementById('helperHistory');
         if (!container) return;
         container.innerHTML = '';
@@ -198,9 +255,9 @@ document.addEventListener('DOMContentLoaded', async () => {
                 ${req.peer_phone ? `<p style="color: var(--primary); font-weight: 700;"><i class="fas fa-phone"></i> Contact: <a href="tel:${req.peer_phone}">${req.peer_phone}</a></p>` : ''}
                 <p><strong>Status:</strong> <span class="badge status-${req.status}">${req.status}</span></p>
                 <p>${req.description.substring(0, 100)}...</p>
-                ${renderAttachments(req.attachments)}
+                ${renderAttachments(req.attachments, req.thumbnails)}
                 <div style="margin-top: 1rem; display: flex; flex-wrap: wrap; gap: 0.5rem;">
-                    <button onclick="viewChat(${req.id}, '${req.title}')" class="btn btn-outline" style="flex: 1;">Chat</button>
+                    <button onclick="viewChat(${req.id}, '${req.title}')" class="btn btn-outline" style="flex: 1;">Chat${renderUnread(req)}</button>
                     ${req.status === 'in_progress' ? `<button onclick="cancelRequest(${req.id})" class="btn btn-outline" style="color: #ef4444; border-color: #ef4444; flex: 1;">Cancel</button>` : ''}
                 </div>
             `;
@@ -208,16 +265,25 @@ document.addEventListener('DOMContentLoaded', async () => {
         });
 
         if (container.innerHTML === '') container.innerHTML = '<p style="color: var(--secondary);">No accepted or completed bookings yet.</p>';
-        updateChatBadge(requests);
+        updateChatBadge();
     }
 
-    async function fetchAvailableRequests() {
-        const requests = await apiFetch('/requests/?status=open');
+    async function fetchAvailableRequests(offset = 0) {
+        const requests = await apiFetch(`/requests/?status=open&limit=${FEED_PAGE_SIZE}&offset=${offset}`);
         if (!requests || !Array.isArray(requests)) return;
+        renderAvailableRequests(requests, offset > 0);
+    }
 
+    function renderAvailableRequests(requests, append = false) {
         const container = document.getElementById('availableRequests');
         if (!container) return;
-        container.innerHTML = '';
+        if (!append) container.innerHTML = '';
+        document.getElementById('loadMoreRequests')?.remove();
+
+        if (!append && requests.length === 0) {
+            container.innerHTML = '<p style="color: var(--secondary);">No active academic support requests at the moment.</p>';
+            return;
+        }
 
         requests.forEach(req => {
             const card = document.createElement('div');
@@ -228,19 +294,29 @@ document.addEventListener('DOMContentLoaded', async () => {
                 <p><strong>Subject:</strong> ${req.subject}</p>
                 <p><strong>Budget:</strong> ₹${req.budget || 'N/A'}</p>
                 <p>${req.description.substring(0, 100)}...</p>
-                ${renderAttachments(req.attachments)}
+                ${renderAttachments(req.attachments, req.thumbnails)}
                 <button onclick="acceptRequest(${req.id})" class="btn btn-primary" style="margin-top: 1rem; width: 100%;">Accept Request</button>
             `;
             container.appendChild(card);
         });
+
+        // A full page means there may be more
+        if (requests.length === FEED_PAGE_SIZE) {
+            const more = document.createElement('button');
+            more.id = 'loadMoreRequests';
+            more.className = 'btn btn-outline';
+            more.textContent = 'Load more';
+            more.onclick = () => fetchAvailableRequests(container.querySelectorAll('.feature-card').length);
+            container.after(more);
+        }
     }
 
-    function updateChatBadge(requests) {
-        const chats = requests.filter(r => r.student_id && r.helper_id && r.status !== 'cancelled');
+    function updateChatBadge() {
+        const totalUnread = Object.values(unreadCounts).reduce((sum, count) => sum + count, 0);
         const badge = document.getElementById('chatBadge');
         if (!badge) return;
-        if (chats.length > 0) {
-            badge.textContent = chats.length;
+        if (totalUnread > 0) {
+            badge.textContent = totalUnread;
             badge.style.display = 'block';
         } else {
             badge.style.display = 'none';
@@ -298,6 +374,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             const currentUser = userStr ? JSON.parse(userStr) : null;
             messages.forEach(msg => appendMessage(msg, currentUser?.id));
         }
+        markChatRead(id);
     };
 
     window.hideChatModal = () => {
@@ -337,7 +414,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             item.innerHTML = `
                 <i class="fas fa-user-circle"></i>
                 <div class="chat-list-info">
-                    <h4>${chat.title}</h4>
+                    <h4>${chat.title}${chat.unread_count ? ` (${chat.unread_count} new)` : ''}</h4>
                     <p>${peerName || 'Peer'}</p>
                 </div>
                 <i class="fas fa-chevron-right" style="font-size: 0.8rem; color: var(--border);"></i>
@@ -401,12 +478,12 @@ document.addEventListener('DOMContentLoaded', async () => {
             e.preventDefault();
             const content = document.getElementById('chatInput').value;
             if (!content || !currentChatId) return;
-            const userStr = localStorage.getItem('user');
-            const user = userStr ? JSON.parse(userStr) : null;
+            // The server sets sender_id from the authenticated socket
             socket.emit('send_message', {
                 request_id: currentChatId,
-                sender_id: user?.id,
                 content: content
+            }, (ack) => {
+                if (ack && ack.last_write) localStorage.setItem('last_write', ack.last_write);
             });
             document.getElementById('chatInput').value = '';
         });